@@ -1,35 +1,69 @@
 import json
+import os
+import threading
+import time
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
+
+ELEVEN_MODEL_ID = "eleven_multilingual_v2"
+ELEVEN_STABILITY = 0.2
+ELEVEN_CLARITY = 0.1
+# Seconds during which the voice list of a key is reused instead of being fetched again
+ELEVEN_VOICES_TTL = int(os.getenv('ELEVEN_VOICES_TTL', 3600))
 
 
 class ElevenLabsAPI:
+    # Shared by every instance, keeps the connections to the API alive between requests
+    _session = None
+    # {api_key: (fetch time, {voice name: voice id})}
+    _voices_cache = {}
+    _lock = threading.Lock()
 
     def __init__(self, api_key):
         self.api_key = api_key
         self.url_base = 'https://api.elevenlabs.io/v1/'
         self.get_voices()
 
-    def get_voices(self):
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        with cls._lock:
+            if cls._session is None:
+                session = requests.Session()
+                # Only idempotent requests are retried, a synthesis is never sent twice
+                retry_strategy = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+                session.mount("https://", HTTPAdapter(pool_maxsize=8, max_retries=retry_strategy))
+                cls._session = session
+            return cls._session
+
+    def get_voices(self, force=False):
         '''Get the list of voices available'''
+        with self._lock:
+            cached = self._voices_cache.get(self.api_key)
+        if cached and not force and time.time() - cached[0] < ELEVEN_VOICES_TTL:
+            self.voices = cached[1]
+            return self.voices
         url = self.url_base + 'voices'
         headers = {'accept': 'application/json'}
         if self.api_key:
             headers['xi-api-key'] = self.api_key
-        response = requests.get(url, headers=headers)
+        response = self.get_session().get(url, headers=headers, timeout=30)
         data = response.json()
         if 'voices' not in data:
             # Provide a clear error message for missing voices
             detail = data.get('detail', {}).get('message', 'No voices found. Check your API key or network connection.')
             raise Exception(f"Error fetching voices: {detail}")
         self.voices = {voice['name']: voice['voice_id'] for voice in data['voices']}
+        with self._lock:
+            self._voices_cache[self.api_key] = (time.time(), self.voices)
         return self.voices
 
     def get_remaining_characters(self):
         '''Get the number of characters remaining'''
         url = self.url_base + 'user'
         headers = {'accept': '*/*', 'xi-api-key': self.api_key, 'Content-Type': 'application/json'}
-        response = requests.get(url, headers=headers)
+        response = self.get_session().get(url, headers=headers, timeout=30)
 
         if response.status_code == 200:
             sub = response.json()['subscription']
@@ -37,21 +71,31 @@ class ElevenLabsAPI:
         else:
             raise Exception(response.json()['detail']['message'])
 
-    def generate_voice(self, text, character, filename, stability=0.2, clarity=0.1):
-        '''Generate a voice'''
+    def generate_voice(self, text, character, filename, stability=ELEVEN_STABILITY, clarity=ELEVEN_CLARITY):
+        '''Generate a voice, streaming the audio to the file as it arrives'''
+        if character not in self.voices:
+            # The voice may have been added since the list was cached
+            self.get_voices(force=True)
         if character not in self.voices:
             print(character, 'is not in the array of characters: ', list(self.voices.keys()))
+            raise Exception(f"The voice {character} isn't available for this ElevenLabs API key")
 
         voice_id = self.voices[character]
         url = f'{self.url_base}text-to-speech/{voice_id}/stream'
         headers = {'accept': '*/*', 'xi-api-key': self.api_key, 'Content-Type': 'application/json'}
-        data = json.dumps({"model_id": "eleven_multilingual_v2", "text": text, "stability": stability, "similarity_boost": clarity})
-        response = requests.post(url, headers=headers, data=data)
-
-        if response.status_code == 200:
-            with open(filename, 'wb') as f:
-                f.write(response.content)
-                return filename
-        else:
-            message = response.text
-            raise Exception(f'Error in response, {response.status_code} , message: {message}')
+        data = json.dumps({"model_id": ELEVEN_MODEL_ID, "text": text, "stability": stability, "similarity_boost": clarity})
+        with self.get_session().post(url, headers=headers, data=data, stream=True, timeout=(10, 120)) as response:
+            if response.status_code != 200:
+                message = response.text
+                raise Exception(f'Error in response, {response.status_code} , message: {message}')
+            temp_file = f"{filename}.{threading.get_ident()}.tmp"
+            try:
+                with open(temp_file, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        if chunk:
+                            f.write(chunk)
+                os.replace(temp_file, filename)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+        return filename
@@ -1,8 +1,10 @@
 import json
-import requests
 import re
+import threading
 import urllib.parse
 
+import requests
+from requests.adapters import HTTPAdapter
 from urllib3 import Retry
 
 def _extractBingImages(html):
@@ -32,33 +34,45 @@ def _extractGoogleImages(html):
               pass
   return images
 
-import urllib.parse
-from requests.adapters import HTTPAdapter
 
-def getBingImages(query, retries=5):
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+_SESSION = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    '''Session shared by the image searches and downloads, so connections to the same hosts are reused across threads'''
+    global _SESSION
+    with _session_lock:
+        if _SESSION is None:
+            session = requests.Session()
+            retry_strategy = Retry(
+                total=5,
+                backoff_factor=1,
+                status_forcelist=[500, 502, 503, 504]
+            )
+            adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retry_strategy)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _SESSION = session
+        return _SESSION
+
+
+def getBingImages(query, retries=5, count=None):
     query = query.replace(" ", "+")
     images = []
     tries = 0
-    
-    # Create a session with custom retry strategy
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=retries,
-        backoff_factor=1,
-        status_forcelist=[500, 502, 503, 504]
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("https://", adapter)
-    
+    session = get_session()
+
     while(len(images) == 0 and tries < retries):
         try:
             # Use verify=False to bypass SSL verification (use with caution)
             response = session.get(
                 f"https://www.bing.com/images/search?q={query}&first=1",
                 verify=False,
-                headers={
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
+                timeout=30
             )
             if(response.status_code == 200):
                 images = _extractBingImages(response.text)
@@ -71,31 +85,8 @@ def getBingImages(query, retries=5):
             if tries >= retries:
                 raise Exception("Max retries reached - SSL Error while making Bing image searches")
             continue
-        
+        tries += 1
+
     if(images):
-        return images
+        return images[:count] if count else images
     raise Exception("Error While making bing image searches")
-
-def getBingImages(search_term, count=10, filter='', subscription_key=None):
-    """Get images from Bing Image Search API."""
-    if not subscription_key:
-        subscription_key = ApiKeyManager.get_api_key("BING_API_KEY")
-    
-    # For car models, ensure proper formatting and add keywords
-    lower_term = search_term.lower()
-    if "genesis" in lower_term and "hyundai" not in lower_term:
-        search_term = f"Hyundai {search_term}"
-    
-    if any(car_term in lower_term for car_term in ["car", "genesis", "hyundai", "bmw", "ferrari"]):
-        search_term = f"{search_term} car photo"
-    
-    # Don't search for just numbers
-    if search_term.strip().isdigit() or (search_term.strip().replace(',', '').isdigit()):
-        search_term = "Hyundai Genesis car"
-    
-    # Remove the word "image" if it exists (since we're already searching for images)
-    search_term = search_term.replace(" image", "").strip()
-    
-    print(f"[INFO] Searching Bing Images for: '{search_term}'")
-    
-    # Make API request
\ No newline at end of file
@@ -1,29 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import Retry
 
 from shortGPT.config.api_db import ApiKeyManager
 
+PEXELS_CACHE_DIR = ".editing_assets/pexels_cache/"
+# Seconds during which the results of a search are reused
+PEXELS_CACHE_TTL = int(os.getenv('PEXELS_CACHE_TTL', 24 * 3600))
+PEXELS_WORKERS = int(os.getenv('PEXELS_WORKERS', 4))
+# Longest wait for the rate limit to reset before giving up on a request
+PEXELS_MAX_RATE_LIMIT_WAIT = int(os.getenv('PEXELS_MAX_RATE_LIMIT_WAIT', 60))
 
-def search_videos(query_string, orientation_landscape=True):
+
+class PexelsAPI:
+    '''
+    Pexels videos client shared by the whole process. Requests go through one pooled session, search results
+    are cached on disk for PEXELS_CACHE_TTL seconds, and the X-Ratelimit-* headers of the answers are tracked
+    so no request is sent once the quota is used up, until it resets.
+    '''
     url = "https://api.pexels.com/videos/search"
-    headers = {
-        "Authorization": ApiKeyManager.get_api_key("PEXELS_API_KEY")
-    }
-    params = {
-        "query": query_string,
-        "orientation": "landscape" if orientation_landscape else "portrait",
-        "per_page": 15
-    }
+    _session = None
+    _lock = threading.Lock()
+    _rate_limit_remaining = None
+    _rate_limit_reset = None
 
-    response = requests.get(url, headers=headers, params=params)
-    json_data = response.json()
-    # print(response.headers['X-Ratelimit-Limit'])
-    # print(response.headers['X-Ratelimit-Remaining'])
-    # print(response.headers['X-Ratelimit-Reset'])
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        with cls._lock:
+            if cls._session is None:
+                session = requests.Session()
+                retry_strategy = Retry(total=3, backoff_factor=1, status_forcelist=[500, 502, 503, 504])
+                session.mount("https://", HTTPAdapter(pool_maxsize=PEXELS_WORKERS * 2, max_retries=retry_strategy))
+                cls._session = session
+            return cls._session
 
-    return json_data
+    @classmethod
+    def search_videos(cls, query_string, orientation_landscape=True, use_cache=True):
+        params = {
+            "query": query_string,
+            "orientation": "landscape" if orientation_landscape else "portrait",
+            "per_page": 15
+        }
+        cached_file = cls._get_cached_file(params)
+        if use_cache:
+            try:
+                with open(cached_file, 'r', encoding='utf-8') as f:
+                    entry = json.load(f)
+                if time.time() - entry['time'] < PEXELS_CACHE_TTL:
+                    return entry['result']
+            except (FileNotFoundError, OSError, ValueError, KeyError):
+                pass
+        json_data = cls._get(params)
+        if not os.path.exists(PEXELS_CACHE_DIR):
+            os.makedirs(PEXELS_CACHE_DIR, exist_ok=True)
+        temp_file = f"{cached_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'time': time.time(), 'result': json_data}, f)
+        os.replace(temp_file, cached_file)
+        return json_data
 
+    @classmethod
+    def get_rate_limit(cls):
+        '''Returns (remaining requests, unix time of the reset) as last reported by Pexels, None when unknown'''
+        with cls._lock:
+            return cls._rate_limit_remaining, cls._rate_limit_reset
 
-def getBestVideo(query_string, orientation_landscape=True, used_vids=[]):
+    @classmethod
+    def _get(cls, params, retry_on_limit=True):
+        cls._wait_for_rate_limit()
+        headers = {
+            "Authorization": ApiKeyManager.get_api_key("PEXELS_API_KEY")
+        }
+        response = cls.get_session().get(cls.url, headers=headers, params=params, timeout=30)
+        cls._update_rate_limit(response.headers)
+        if response.status_code == 429 and retry_on_limit:
+            with cls._lock:
+                cls._rate_limit_remaining = 0
+                if cls._rate_limit_reset is None:
+                    cls._rate_limit_reset = time.time() + int(response.headers.get('Retry-After', 1))
+            return cls._get(params, retry_on_limit=False)
+        if response.status_code != 200:
+            raise Exception(f"Pexels search for '{params['query']}' failed ({response.status_code}): {response.text}")
+        return response.json()
+
+    @classmethod
+    def _update_rate_limit(cls, headers):
+        remaining, reset = headers.get('X-Ratelimit-Remaining'), headers.get('X-Ratelimit-Reset')
+        if remaining is None:
+            return
+        with cls._lock:
+            cls._rate_limit_remaining = int(remaining)
+            cls._rate_limit_reset = int(reset) if reset is not None else None
+        if int(remaining) < 20:
+            print(f"Pexels rate limit almost reached: {remaining} of {headers.get('X-Ratelimit-Limit')} requests remaining")
+
+    @classmethod
+    def _wait_for_rate_limit(cls):
+        with cls._lock:
+            remaining, reset = cls._rate_limit_remaining, cls._rate_limit_reset
+        if remaining is None or remaining > 0 or reset is None:
+            return
+        wait = reset - time.time()
+        if wait <= 0:
+            return
+        if wait > PEXELS_MAX_RATE_LIMIT_WAIT:
+            raise Exception(f"Pexels rate limit reached, it resets in {int(wait)} seconds")
+        print(f"Pexels rate limit reached, waiting {int(wait)} seconds for it to reset")
+        time.sleep(wait)
+
+    @staticmethod
+    def _get_cached_file(params) -> str:
+        key = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+        return os.path.join(PEXELS_CACHE_DIR, f"{key}.json")
+
+
+def search_videos(query_string, orientation_landscape=True):
+    return PexelsAPI.search_videos(query_string, orientation_landscape)
+
+
+def getVideoCandidates(query_string, orientation_landscape=True):
+    """Returns the links of the videos matching the query at 1920x1080 (or 1080x1920), best first"""
     vids = search_videos(query_string, orientation_landscape)
     videos = vids['videos']  # Extract the videos list from JSON
 
@@ -36,16 +139,59 @@ def getBestVideo(query_string, orientation_landscape=True, used_vids=[]):
     # Sort the filtered videos by duration in ascending order
     sorted_videos = sorted(filtered_videos, key=lambda x: abs(15-int(x['duration'])))
 
-    # Extract the top 3 videos' URLs
+    links = []
     for video in sorted_videos:
         for video_file in video['video_files']:
             if orientation_landscape:
                 if video_file['width'] == 1920 and video_file['height'] == 1080:
-                    if not (video_file['link'].split('.hd')[0] in used_vids):
-                        return video_file['link']
+                    links.append(video_file['link'])
             else:
                 if video_file['width'] == 1080 and video_file['height'] == 1920:
-                    if not (video_file['link'].split('.hd')[0] in used_vids):
-                        return video_file['link']
+                    links.append(video_file['link'])
+    return links
+
+
+def getBestVideo(query_string, orientation_landscape=True, used_vids=[]):
+    for link in getVideoCandidates(query_string, orientation_landscape):
+        if not (link.split('.hd')[0] in used_vids):
+            return link
     print("NO LINKS found for this round of search with query :", query_string)
     return None
+
+
+def getBestVideosTimed(timed_video_searches, orientation_landscape=True, max_workers=PEXELS_WORKERS):
+    """Finds a video for each [[t1, t2], search_terms] segment, searching every distinct query concurrently.
+    The queries of a segment are tried from the last to the first, and a video is used only once:
+    this deduplication is applied in segment order once all the searches are done, so the result is
+    the same as searching the segments one after the other.
+    Returns:
+        list: [[t1, t2], url] segments, url is None when no unused video was found.
+    """
+    queries = list(dict.fromkeys(query for _, search_terms in timed_video_searches for query in search_terms))
+
+    def get_candidates(query):
+        try:
+            return getVideoCandidates(query, orientation_landscape)
+        except Exception as e:
+            print(f"Pexels search failed for query '{query}': {e}")
+            return e
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        candidates = dict(zip(queries, executor.map(get_candidates, queries)))
+    errors = [result for result in candidates.values() if isinstance(result, Exception)]
+    if queries and len(errors) == len(queries):
+        raise Exception(f"Every Pexels search failed: {errors[0]}")
+
+    timed_video_urls = []
+    used_vids = set()
+    for (t1, t2), search_terms in timed_video_searches:
+        url = None
+        for query in reversed(search_terms):
+            links = candidates[query] if not isinstance(candidates[query], Exception) else []
+            url = next((link for link in links if link.split('.hd')[0] not in used_vids), None)
+            if url:
+                used_vids.add(url.split('.hd')[0])
+                break
+            print("NO LINKS found for this round of search with query :", query)
+        timed_video_urls.append([[t1, t2], url])
+    return timed_video_urls
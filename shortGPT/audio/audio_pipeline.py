@@ -0,0 +1,102 @@
+import os
+import subprocess
+from typing import List, Optional, Tuple
+
+from shortGPT.audio.audio_duration import get_asset_duration
+
+AUDIO_SAMPLE_RATE = 44100
+# Shorts are sped up to stay under this duration
+MAX_SHORT_DURATION = 57
+# The music loop skips the intro of the track, same as the loop_background_music editing action
+MUSIC_LOOP_START_RATIO = 0.15
+# Integrated loudness (LUFS) the background music is brought to before its volume is applied
+MUSIC_LOUDNESS_TARGET = float(os.getenv('MUSIC_LOUDNESS_TARGET', -14))
+VOICE_LOUDNESS_TARGET = float(os.getenv('VOICE_LOUDNESS_TARGET', -16))
+
+
+def _num(value):
+    return f"{float(value):.6f}".rstrip('0').rstrip('.')
+
+
+def get_tempo(duration, expected_duration=None, max_duration=MAX_SHORT_DURATION):
+    '''Tempo factor fitting an audio of the given duration to expected_duration, or under max_duration'''
+    if expected_duration:
+        return duration / expected_duration
+    if max_duration and duration > max_duration:
+        return duration / max_duration
+    return 1.0
+
+
+def build_audio_command(voiceover_path, output_file, tempo=1.0, music_path=None, music_duration=None, duration=None,
+                        music_volume=0.11, normalize_voice=False, normalize_music=True, duck=False) -> List[str]:
+    '''
+    Builds the ffmpeg command doing the whole audio post-processing in one invocation:
+    tempo of the voiceover, loudness normalization, looping of the music over the voiceover,
+    music volume (or ducking under the voice) and the final mix.
+    duration is the duration of the output, music_duration is needed to loop the music.
+    '''
+    voice_filters = []
+    if abs(tempo - 1) > 1e-4:
+        voice_filters.append(f"atempo={tempo:.5f}")
+    if normalize_voice:
+        voice_filters.append(f"loudnorm=I={_num(VOICE_LOUDNESS_TARGET)}:TP=-1.5:LRA=11")
+    voice_filters += [f"aresample={AUDIO_SAMPLE_RATE}", "aformat=sample_fmts=fltp:channel_layouts=stereo"]
+
+    command = ['ffmpeg', '-y', '-loglevel', 'error', '-i', voiceover_path]
+    if not music_path:
+        command += ['-af', ','.join(voice_filters), '-ar', str(AUDIO_SAMPLE_RATE), output_file]
+        return command
+
+    if not duration or not music_duration:
+        raise Exception("The output and music durations are needed to loop the background music")
+    loop_start = music_duration * MUSIC_LOOP_START_RATIO
+    loop_samples = int((music_duration - loop_start) * AUDIO_SAMPLE_RATE)
+    music_filters = [f"aresample={AUDIO_SAMPLE_RATE}", "aformat=sample_fmts=fltp:channel_layouts=stereo",
+                     f"atrim=start={_num(loop_start)}", "asetpts=N/SR/TB",
+                     f"aloop=loop=-1:size={loop_samples}", f"atrim=duration={_num(duration)}", "asetpts=N/SR/TB"]
+    if normalize_music:
+        # loudnorm upsamples its output, the mix has to be brought back to the render sample rate
+        music_filters += [f"loudnorm=I={_num(MUSIC_LOUDNESS_TARGET)}:TP=-2:LRA=11", f"aresample={AUDIO_SAMPLE_RATE}"]
+    music_filters.append(f"volume={_num(music_volume)}")
+
+    filters = [f"[0:a]{','.join(voice_filters)}[voice]", f"[1:a]{','.join(music_filters)}[music]"]
+    if duck:
+        filters[0] = f"[0:a]{','.join(voice_filters)},asplit=2[voice][sidechain]"
+        filters.append("[music][sidechain]sidechaincompress=threshold=0.03:ratio=6:attack=20:release=400[ducked]")
+        music_label = "[ducked]"
+    else:
+        music_label = "[music]"
+    filters.append(f"[voice]{music_label}amix=inputs=2:duration=first:dropout_transition=0:normalize=0[aout]")
+    command += ['-i', music_path, '-filter_complex', ';'.join(filters), '-map', '[aout]',
+                '-ar', str(AUDIO_SAMPLE_RATE), '-t', _num(duration), output_file]
+    return command
+
+
+def process_audio(voiceover_path, output_file, music_path=None, expected_duration=None, max_duration=None,
+                  voiceover_duration=None, music_duration=None, music_volume=0.11,
+                  normalize_voice=False, normalize_music=True, duck=False) -> Tuple[str, float]:
+    '''
+    Fits the voiceover to expected_duration (or under max_duration) and mixes the background music under it,
+    in a single ffmpeg pass. The durations of the inputs are probed only when they aren't given.
+    Returns the output file and its duration, so callers don't have to probe it again.
+    '''
+    if voiceover_duration is None:
+        voiceover_path, voiceover_duration = get_asset_duration(voiceover_path, isVideo=False)
+    tempo = get_tempo(voiceover_duration, expected_duration, max_duration)
+    duration = voiceover_duration / tempo
+    if music_path and music_duration is None:
+        music_path, music_duration = get_asset_duration(music_path, isVideo=False)
+    command = build_audio_command(voiceover_path, output_file, tempo=tempo, music_path=music_path,
+                                  music_duration=music_duration, duration=duration, music_volume=music_volume,
+                                  normalize_voice=normalize_voice, normalize_music=normalize_music, duck=duck)
+    process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if process.returncode != 0 or not os.path.exists(output_file):
+        raise Exception(f"Audio processing of {voiceover_path} failed: {process.stderr.strip()}")
+    return output_file, duration
+
+
+def mix_voiceover_and_music(voiceover_path, music_path, output_file, voiceover_duration=None, music_duration=None,
+                            music_volume=0.11, duck=False) -> Tuple[str, float]:
+    '''Mixes the looped, normalized background music under an already timed voiceover. Returns (output_file, duration)'''
+    return process_audio(voiceover_path, output_file, music_path=music_path, voiceover_duration=voiceover_duration,
+                         music_duration=music_duration, music_volume=music_volume, duck=duck)
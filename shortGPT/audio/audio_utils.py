@@ -1,14 +1,21 @@
 import os
 import subprocess
+import tempfile
 import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import yt_dlp
 
-from shortGPT.audio.audio_duration import get_asset_duration
+from shortGPT.audio import audio_pipeline
+from shortGPT.audio.transcription_cache import TRANSCRIPTION_CACHE
+from shortGPT.audio.whisper_server import WHISPER_SERVER_ADDRESS, WhisperClient
 
 CONST_CHARS_PER_SEC = 20.5  # Arrived to this result after whispering a ton of shorts and calculating the average number of characters per second of speech.
 
 WHISPER_MODEL = None
+WHISPER_MODEL_SIZE = None
+# Simultaneous ffmpeg tempo adjustments and probes of generateTimedVoiceBlocks
+AUDIO_POSTPROCESS_WORKERS = int(os.getenv('AUDIO_POSTPROCESS_WORKERS', 4))
 
 
 
@@ -43,16 +50,64 @@ def downloadYoutubeAudio(url, outputFile):
     return None
 
 def speedUpAudio(tempAudioPath, outputFile, expected_duration=None):
-    tempAudioPath, duration = get_asset_duration(tempAudioPath, False)
-    if not expected_duration:
-        if (duration > 57):
-            subprocess.run(['ffmpeg', '-loglevel', 'error', '-i', tempAudioPath, '-af', f'atempo={(duration/57):.5f}', outputFile])
-        else:
-            subprocess.run(['ffmpeg', '-loglevel', 'error', '-i', tempAudioPath, outputFile])
-    else:
-        subprocess.run(['ffmpeg', '-loglevel', 'error', '-i', tempAudioPath, '-af', f'atempo={(duration/expected_duration):.5f}', outputFile])
-    if (os.path.exists(outputFile)):
-        return outputFile
+    outputFile, _ = audio_pipeline.process_audio(tempAudioPath, outputFile, expected_duration=expected_duration,
+                                                 max_duration=audio_pipeline.MAX_SHORT_DURATION)
+    return outputFile
+
+def generateTimedVoiceBlocks(voiceModule, timed_texts, output_template, done=None, on_result=None):
+    """Synthesizes timed texts and fits each voice block to its time slot, as a pipeline.
+    Up to voiceModule.max_concurrency blocks are synthesized at once, while the tempo adjustment
+    of finished blocks runs in a separate pool, overlapping with the synthesis of later blocks.
+    Args:
+        voiceModule (VoiceModule): The voice module generating the audio.
+        timed_texts (list): [[t1, t2], text] blocks.
+        output_template (str): Path of the audio files without extension, with an {index} placeholder.
+        done (dict): [[t1, t1 + duration], path] blocks already generated, by index. Those whose file still exists are kept.
+        on_result (callable): Called in the calling thread with (index, block) as soon as a block is ready, to checkpoint progress.
+    Returns:
+        list: The [[t1, t1 + duration], path] blocks, in the order of timed_texts.
+    """
+    results = {i: block for i, block in (done or {}).items() if os.path.exists(block[1])}
+    pending = [i for i in range(len(timed_texts)) if i not in results]
+
+    def synthesize(i):
+        _, text = timed_texts[i]
+        voice = voiceModule.generate_voice(text, output_template.format(index=i) + ".wav")
+        if not voice:
+            raise Exception('An error happending during audio voice creation')
+        return voice
+
+    def fit_to_slot(i, voice):
+        (t1, t2), _ = timed_texts[i]
+        output_file = output_template.format(index=i) + "_spedup.wav"
+        # The duration of the output follows from the tempo, it isn't probed again
+        final_audio_path, duration = audio_pipeline.process_audio(voice, output_file, expected_duration=t2-t1 - 0.05)
+        return [[t1, t1+duration], final_audio_path]
+
+    errors = []
+    synthesis_workers = max(getattr(voiceModule, 'max_concurrency', 1), 1)
+    with ThreadPoolExecutor(synthesis_workers) as synthesis_pool, ThreadPoolExecutor(AUDIO_POSTPROCESS_WORKERS) as postprocess_pool:
+        futures = {synthesis_pool.submit(synthesize, i): ('synthesis', i) for i in pending}
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, i = futures.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Keep collecting the other blocks, so they are checkpointed before failing
+                    errors.append(e)
+                    continue
+                if stage == 'synthesis':
+                    futures[postprocess_pool.submit(fit_to_slot, i, result)] = ('postprocess', i)
+                else:
+                    results[i] = result
+                    if on_result:
+                        on_result(i, result)
+    if errors:
+        raise Exception(f"Failed generating {len(timed_texts) - len(results)} of {len(timed_texts)} audio blocks: {errors[0]}")
+    return [results[i] for i in range(len(timed_texts))]
+
 
 def ChunkForAudio(alltext, chunk_size=2500):
     alltext_list = alltext.split('.')
@@ -69,12 +124,36 @@ def ChunkForAudio(alltext, chunk_size=2500):
     return chunks
 
 
-def audioToText(filename, model_size="base"):
+def audioToText(filename, model_size="base", use_cache=True, cache_id=None, **options):
+    options = {'fp16': False, **options}
+    if use_cache and os.path.isfile(filename):
+        source = TRANSCRIPTION_CACHE.hash_audio(filename)
+    elif use_cache and cache_id:
+        # Remote streams (youtube audio links) are signed per request, they are keyed on the stable id of their source
+        source = f"id:{cache_id}"
+    else:
+        # Remote streams without an id are streamed straight to whisper, they aren't downloaded to be hashed
+        return _transcribe(filename, model_size, options)
+    key = TRANSCRIPTION_CACHE.get_key(source, model_size, options)
+    result = TRANSCRIPTION_CACHE.get(key)
+    if result is None:
+        result = _transcribe(filename, model_size, options)
+        TRANSCRIPTION_CACHE.put(key, result)
+    return result
+
+
+def _transcribe(filename, model_size, options):
+    if WHISPER_SERVER_ADDRESS:
+        client = WhisperClient(WHISPER_SERVER_ADDRESS)
+        if client.is_available():
+            return client.transcribe(filename, model_size, **options)
+        print(f"Whisper server unreachable at {WHISPER_SERVER_ADDRESS}, transcribing in this process")
     from whisper_timestamped import load_model, transcribe_timestamped
-    global WHISPER_MODEL
-    if (WHISPER_MODEL == None):
+    global WHISPER_MODEL, WHISPER_MODEL_SIZE
+    if (WHISPER_MODEL == None or WHISPER_MODEL_SIZE != model_size):
         WHISPER_MODEL = load_model(model_size)
-    gen = transcribe_timestamped(WHISPER_MODEL, filename, verbose=False, fp16=False)
+        WHISPER_MODEL_SIZE = model_size
+    gen = transcribe_timestamped(WHISPER_MODEL, filename, verbose=False, **options)
     return gen
 
 
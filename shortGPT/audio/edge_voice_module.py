@@ -1,6 +1,7 @@
 import asyncio
 import os
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import uuid
 
 import edge_tts
 
@@ -8,14 +9,50 @@ from shortGPT.audio.voice_module import VoiceModule
 from shortGPT.config.languages import (EDGE_TTS_VOICENAME_MAPPING,
                                        LANGUAGE_ACRONYM_MAPPING, Language)
 
+EDGE_TTS_MAX_CONCURRENCY = int(os.getenv('EDGE_TTS_MAX_CONCURRENCY', 4))
 
-def run_async_func(loop, func):
-    return loop.run_until_complete(func)
+_EVENT_LOOP = None
+_event_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    '''Returns the long-lived event loop running the edge_tts syntheses, started on first use in a daemon thread'''
+    global _EVENT_LOOP
+    with _event_loop_lock:
+        if _EVENT_LOOP is None:
+            _EVENT_LOOP = asyncio.new_event_loop()
+            threading.Thread(target=_EVENT_LOOP.run_forever, name="edge-tts-loop", daemon=True).start()
+        return _EVENT_LOOP
+
+
+def run_async_func(coroutine):
+    '''Runs a coroutine on the shared event loop and waits for its result'''
+    loop = get_event_loop()
+    try:
+        running_loop = asyncio.get_running_loop()
+    except RuntimeError:
+        running_loop = None
+    if running_loop is loop:
+        raise Exception("The synchronous edge_tts API can't be called from its own event loop, await the async API instead")
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+
+async def run_on_event_loop(coroutine):
+    '''Awaits a coroutine run on the shared event loop, from any event loop'''
+    loop = get_event_loop()
+    if asyncio.get_running_loop() is loop:
+        return await coroutine
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
 
 
 class EdgeTTSVoiceModule(VoiceModule):
-    def __init__(self, voiceName):
+    max_concurrency = EDGE_TTS_MAX_CONCURRENCY
+
+    def __init__(self, voiceName, max_concurrency=None):
         self.voiceName = voiceName
+        if max_concurrency:
+            self.max_concurrency = max_concurrency
+        self._semaphore = None
         super().__init__()
 
     def update_usage(self):
@@ -24,29 +61,62 @@ class EdgeTTSVoiceModule(VoiceModule):
     def get_remaining_characters(self):
         return 999999999999
 
-    def generate_voice(self, text, outputfile):
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+    def _generate_voice(self, text, outputfile):
+        return run_async_func(self._agenerate_voice(text, outputfile))
+
+    def generate_many(self, texts_and_outputfiles):
+        return run_async_func(self._agenerate_many(texts_and_outputfiles))
+
+    async def agenerate_voice(self, text, outputfile):
+        """Same as generate_voice, voices already synthesized are taken from the TTS cache.
+        The synthesis runs on the shared event loop, whichever loop awaits it."""
+        return await run_on_event_loop(self._agenerate_cached_voice(text, outputfile))
 
-        try:
-            with ThreadPoolExecutor() as executor:
-                loop.run_in_executor(executor, run_async_func, loop, self.async_generate_voice(text, outputfile))
+    async def _agenerate_cached_voice(self, text, outputfile):
+        # The cache links, copies and evicts files, kept off the event loop
+        loop = asyncio.get_running_loop()
+        key, cached = await loop.run_in_executor(None, self._get_cached_voice, text, outputfile)
+        if cached:
+            return outputfile
+        result = await self._agenerate_voice(text, outputfile)
+        await loop.run_in_executor(None, self._cache_voice, key, result)
+        return result
 
-        finally:
-            loop.close()
+    async def _agenerate_voice(self, text, outputfile):
+        # Only ever used on the shared event loop, limits the number of simultaneous connections to the service
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        temp_file = f"{outputfile}.{uuid.uuid4().hex}.tmp"
+        async with self._semaphore:
+            try:
+                communicate = edge_tts.Communicate(text, self.voiceName)
+                with open(temp_file, "wb") as file:
+                    async for chunk in communicate.stream():
+                        if chunk["type"] == "audio":
+                            file.write(chunk["data"])
+                os.replace(temp_file, outputfile)
+            except Exception as e:
+                print("Error generating audio using edge_tts", e)
+                raise Exception("An error happened during edge_tts audio generation, no output audio generated", e)
+            finally:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
         if not os.path.exists(outputfile):
-            print("An error happened during edge_tts audio generation, no output audio generated")
             raise Exception("An error happened during edge_tts audio generation, no output audio generated")
         return outputfile
 
-    async def async_generate_voice(self, text, outputfile):
-        try:
-            communicate = edge_tts.Communicate(text, self.voiceName)
-            with open(outputfile, "wb") as file:
-                async for chunk in communicate.stream():
-                    if chunk["type"] == "audio":
-                        file.write(chunk["data"])
-        except Exception as e:
-            print("Error generating audio using edge_tts", e)
-            raise Exception("An error happened during edge_tts audio generation, no output audio generated", e)
-        return outputfile
+    async def agenerate_many(self, texts_and_outputfiles):
+        """Synthesizes several (text, outputfile) pairs concurrently, up to max_concurrency at a time.
+        Returns the output files in order, raises the first error once every synthesis has finished."""
+        return await run_on_event_loop(self._agenerate_many(texts_and_outputfiles))
+
+    async def _agenerate_many(self, texts_and_outputfiles):
+        results = await asyncio.gather(*[self._agenerate_cached_voice(text, outputfile) for text, outputfile in texts_and_outputfiles],
+                                       return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    # Previous name of agenerate_voice
+    async_generate_voice = agenerate_voice
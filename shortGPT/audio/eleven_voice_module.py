@@ -1,12 +1,19 @@
-from shortGPT.api_utils.eleven_api import ElevenLabsAPI
+import threading
+
+from shortGPT.api_utils.eleven_api import (ELEVEN_CLARITY, ELEVEN_MODEL_ID,
+                                           ELEVEN_STABILITY, ElevenLabsAPI)
 from shortGPT.audio.voice_module import VoiceModule
 
 
 class ElevenLabsVoiceModule(VoiceModule):
+    # Concurrent requests allowed by the smaller ElevenLabs plans
+    max_concurrency = 2
+
     def __init__(self, api_key, voiceName, checkElevenCredits=False):
         self.api_key = api_key
         self.voiceName = voiceName
         self.remaining_credits = None
+        self._usage_lock = threading.Lock()
         self.eleven_labs_api = ElevenLabsAPI(self.api_key)
         self.update_usage()
         if checkElevenCredits and self.get_remaining_characters() < 1200:
@@ -14,16 +21,27 @@ class ElevenLabsVoiceModule(VoiceModule):
         super().__init__()
 
     def update_usage(self):
-        self.remaining_credits = self.eleven_labs_api.get_remaining_characters()
+        remaining_credits = self.eleven_labs_api.get_remaining_characters()
+        with self._usage_lock:
+            self.remaining_credits = remaining_credits
         return self.remaining_credits
 
     def get_remaining_characters(self):
-        return self.remaining_credits if self.remaining_credits else self.eleven_labs_api.get_remaining_characters()
+        return self.remaining_credits if self.remaining_credits is not None else self.update_usage()
+
+    def _track_usage(self, characters):
+        # ElevenLabs bills the characters of the text, the usage is tracked locally instead of asking the API again
+        with self._usage_lock:
+            if self.remaining_credits is not None:
+                self.remaining_credits -= characters
+
+    def get_voice_settings(self):
+        return {'model_id': ELEVEN_MODEL_ID, 'stability': ELEVEN_STABILITY, 'similarity_boost': ELEVEN_CLARITY}
 
-    def generate_voice(self, text, outputfile):
+    def _generate_voice(self, text, outputfile):
         if self.get_remaining_characters() >= len(text):
             file_path =self.eleven_labs_api.generate_voice(text=text, character=self.voiceName, filename=outputfile)
-            self.update_usage()
+            self._track_usage(len(text))
             return file_path
         else:
             raise Exception(f"You cannot generate {len(text)} characters as your ElevenLabs key has only {self.remaining_credits} characters remaining")
@@ -0,0 +1,80 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+TRANSCRIPTION_CACHE_DIR = ".editing_assets/transcription_cache/"
+
+
+class TranscriptionCache:
+    '''
+    On-disk cache of whisper transcriptions, keyed by the sha256 of the audio bytes (or the stable id of a remote
+    stream), the model size and the options.
+    The same audio transcribed again (one source video translated into several languages, a retried
+    _timeCaptions step) is read back instead of going through whisper.
+    Each result is stored whole, segments and words included, as gzipped json.
+    '''
+
+    def __init__(self, cache_dir=TRANSCRIPTION_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._file_hashes = {}
+        self._lock = threading.Lock()
+
+    def get_key(self, audio_source: str, model_size: str, options: Dict[str, Any]) -> str:
+        description = json.dumps({'audio': audio_source, 'model': model_size, 'options': options}, sort_keys=True, default=str)
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def hash_audio(self, path) -> str:
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if signature in self._file_hashes:
+                return self._file_hashes[signature]
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        with self._lock:
+            self._file_hashes[signature] = sha.hexdigest()
+        return sha.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        cached_file = self._get_cached_file(key)
+        try:
+            with gzip.open(cached_file, 'rt', encoding='utf-8') as f:
+                result = json.load(f)
+        except (FileNotFoundError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]):
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        cached_file = self._get_cached_file(key)
+        temp_file = f"{cached_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(temp_file, 'wt', encoding='utf-8') as f:
+            json.dump(result, f, separators=(',', ':'), default=float)
+        os.replace(temp_file, cached_file)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        if os.path.exists(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, filename))
+
+    def _get_cached_file(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+
+TRANSCRIPTION_CACHE = TranscriptionCache()
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from shortGPT.utils.file_utils import link_or_copy
+
+TTS_CACHE_DIR = ".editing_assets/tts_cache/"
+TTS_CACHE_MAX_BYTES = int(os.getenv('TTS_CACHE_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+
+class TTSCache:
+    '''
+    Cache of synthesized voices, keyed by the voice module class, the voice name, the sha256 of the text
+    and the synthesis settings. Resumed jobs, repeated intros and translation re-runs reuse the audio
+    instead of synthesizing it again, which for ElevenLabs also saves paid characters.
+    Entries are evicted least recently used first once the cache exceeds max_size_bytes.
+    '''
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, max_size_bytes=TTS_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_key(self, module_name: str, voice_name: str, text: str, settings: Dict[str, Any]) -> str:
+        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        description = json.dumps({'module': module_name, 'voice': voice_name, 'text': text_hash, 'settings': settings},
+                                 sort_keys=True, default=str)
+        return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, output_file) -> Optional[str]:
+        '''Places the cached audio at output_file. Returns None on a cache miss'''
+        cached_file = self._get_cached_file(key)
+        if not os.path.exists(cached_file):
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(cached_file)
+        link_or_copy(cached_file, output_file)
+        with self._lock:
+            self.hits += 1
+        return output_file
+
+    def put(self, key: str, audio_file):
+        if not os.path.exists(audio_file):
+            return
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        cached_file = self._get_cached_file(key)
+        temp_file = f"{cached_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        link_or_copy(audio_file, temp_file)
+        os.replace(temp_file, cached_file)
+        self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _get_cached_file(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.audio")
+
+    def _evict(self):
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.audio'):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        while entries and total_size > self.max_size_bytes:
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+TTS_CACHE = TTSCache()
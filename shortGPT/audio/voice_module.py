@@ -1,5 +1,14 @@
+import os
 from abc import ABC, abstractmethod
+
+from shortGPT.audio.tts_cache import TTS_CACHE
+
+
 class VoiceModule(ABC):
+    # Number of voices that can be generated at the same time
+    max_concurrency = 1
+    # Voices are reused from the TTS cache when the same text was already synthesized with the same voice and settings
+    use_cache = True
 
     def __init__(self):
         pass
@@ -11,6 +20,34 @@ class VoiceModule(ABC):
     def get_remaining_characters(self):
         pass
 
+    def generate_voice(self, text, outputfile):
+        key, cached = self._get_cached_voice(text, outputfile)
+        if cached:
+            return outputfile
+        result = self._generate_voice(text, outputfile)
+        self._cache_voice(key, result)
+        return result
+
+    def _get_cached_voice(self, text, outputfile):
+        '''Returns the cache key of the voice (None when the cache is disabled) and whether outputfile was taken from the cache'''
+        if not self.use_cache:
+            return None, False
+        key = TTS_CACHE.get_key(type(self).__name__, getattr(self, 'voiceName', None), text, self.get_voice_settings())
+        if TTS_CACHE.get(key, outputfile):
+            return key, True
+        # The previous file may be hard-linked to a cache entry, it mustn't be overwritten in place
+        if os.path.exists(outputfile):
+            os.remove(outputfile)
+        return key, False
+
+    def _cache_voice(self, key, result):
+        if key and result:
+            TTS_CACHE.put(key, result)
+
     @abstractmethod
-    def generate_voice(self,text, outputfile):
-        pass
\ No newline at end of file
+    def _generate_voice(self, text, outputfile):
+        pass
+
+    def get_voice_settings(self):
+        '''Synthesis settings other than the voice name that change the generated audio'''
+        return {}
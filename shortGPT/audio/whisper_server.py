@@ -0,0 +1,203 @@
+import argparse
+import os
+import queue
+import secrets
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import Any, Dict, List
+
+if sys.platform == 'win32':
+    DEFAULT_WHISPER_SERVER_ADDRESS = r'\\.\pipe\shortgpt_whisper'
+else:
+    DEFAULT_WHISPER_SERVER_ADDRESS = os.path.join(tempfile.gettempdir(), 'shortgpt_whisper.sock')
+WHISPER_SERVER_ADDRESS = os.getenv('WHISPER_SERVER_ADDRESS', '')
+# The key authenticating clients is read from WHISPER_SERVER_AUTHKEY, or else from this file, readable by its owner only
+WHISPER_SERVER_AUTHKEY_FILE = os.getenv('WHISPER_SERVER_AUTHKEY_FILE',
+                                        os.path.join(os.path.expanduser('~'), '.shortgpt_whisper_authkey'))
+
+
+def load_authkey(key_file=WHISPER_SERVER_AUTHKEY_FILE):
+    '''Returns the key shared by the server and its clients, None when it isn't configured'''
+    if os.getenv('WHISPER_SERVER_AUTHKEY'):
+        return os.getenv('WHISPER_SERVER_AUTHKEY').encode('utf-8')
+    try:
+        with open(key_file, 'r', encoding='utf-8') as f:
+            key = f.read().strip()
+    except (FileNotFoundError, OSError):
+        return None
+    return key.encode('utf-8') if key else None
+
+
+def generate_authkey(key_file=WHISPER_SERVER_AUTHKEY_FILE):
+    '''Writes a random key to key_file with 0600 permissions, and returns it'''
+    key = secrets.token_hex(32)
+    fd = os.open(key_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(key)
+    return key.encode('utf-8')
+
+
+class WhisperJob:
+    def __init__(self, files: List[str], model_size: str, options: Dict[str, Any]):
+        self.files = files
+        self.model_size = model_size
+        self.options = options
+        self.submitted = time.time()
+        self.started = None
+        self.results = []
+        self.latencies = []
+        self.error = None
+        self.done = threading.Event()
+
+
+class WhisperServer:
+    '''
+    Long-lived transcription worker keeping whisper models resident between jobs.
+    Engines of any process reach it through WhisperClient, over a unix socket (a named pipe on Windows).
+    Requests are queued and run one at a time on the resident models, each request can hold several files.
+    '''
+
+    def __init__(self, address=DEFAULT_WHISPER_SERVER_ADDRESS, model_sizes=('base',), authkey=None):
+        self.address = address
+        self.authkey = authkey or load_authkey()
+        if not self.authkey:
+            raise Exception(f"No whisper server key: set WHISPER_SERVER_AUTHKEY, or create {WHISPER_SERVER_AUTHKEY_FILE} "
+                            f"by starting the server with --generate-key")
+        self.models = {}
+        self.jobs = queue.Queue()
+        self.processed_files = 0
+        self.total_latency = 0.0
+        self._lock = threading.Lock()
+        for model_size in model_sizes:
+            self._get_model(model_size)
+
+    def serve_forever(self):
+        if sys.platform != 'win32' and os.path.exists(self.address):
+            os.remove(self.address)
+        threading.Thread(target=self._work, daemon=True).start()
+        with Listener(self.address, authkey=self.authkey) as listener:
+            print(f"Whisper server listening on {self.address} with models {list(self.models)}")
+            while True:
+                try:
+                    connection = listener.accept()
+                except Exception as e:
+                    print(f"Refused whisper client connection: {e}")
+                    continue
+                threading.Thread(target=self._handle_connection, args=(connection,), daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'queue_depth': sum(len(job.files) for job in list(self.jobs.queue)),
+                'processed_files': self.processed_files,
+                'average_latency': self.total_latency / self.processed_files if self.processed_files else 0.0,
+                'models': list(self.models),
+            }
+
+    def _handle_connection(self, connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                if request.get('op') == 'stats':
+                    connection.send(self.stats())
+                    continue
+                job = WhisperJob(request['files'], request.get('model_size', 'base'), request.get('options', {}))
+                self.jobs.put(job)
+                job.done.wait()
+                if job.error:
+                    connection.send({'error': job.error})
+                else:
+                    connection.send({'results': job.results, 'latencies': job.latencies,
+                                     'queue_wait': job.started - job.submitted})
+
+    def _work(self):
+        from whisper_timestamped import transcribe_timestamped
+        while True:
+            job = self.jobs.get()
+            job.started = time.time()
+            try:
+                model = self._get_model(job.model_size)
+                for filename in job.files:
+                    start = time.time()
+                    job.results.append(transcribe_timestamped(model, filename, verbose=False, **job.options))
+                    latency = time.time() - start
+                    job.latencies.append(latency)
+                    with self._lock:
+                        self.processed_files += 1
+                        self.total_latency += latency
+            except Exception as e:
+                job.error = f"Whisper server failed transcribing {job.files}: {e}"
+            job.done.set()
+
+    def _get_model(self, model_size):
+        if model_size not in self.models:
+            from whisper_timestamped import load_model
+            print(f"Loading whisper model {model_size}")
+            model = load_model(model_size)
+            with self._lock:
+                self.models[model_size] = model
+        return self.models[model_size]
+
+
+class WhisperClient:
+    '''Sends transcription requests to a running WhisperServer'''
+
+    def __init__(self, address=None, authkey=None):
+        self.address = address or WHISPER_SERVER_ADDRESS or DEFAULT_WHISPER_SERVER_ADDRESS
+        self.authkey = authkey or load_authkey()
+
+    def is_available(self) -> bool:
+        if not self.authkey:
+            print("Whisper server key not found, set WHISPER_SERVER_AUTHKEY or WHISPER_SERVER_AUTHKEY_FILE")
+            return False
+        if sys.platform != 'win32' and not os.path.exists(self.address):
+            return False
+        try:
+            self.stats()
+            return True
+        except Exception:
+            return False
+
+    def transcribe(self, filename, model_size="base", **options) -> Dict[str, Any]:
+        return self.transcribe_many([filename], model_size, **options)[0]
+
+    def transcribe_many(self, filenames: List[str], model_size="base", **options) -> List[Dict[str, Any]]:
+        # The server may run in another working directory
+        files = [os.path.abspath(f) if os.path.exists(f) else f for f in filenames]
+        response = self._request({'op': 'transcribe', 'files': files, 'model_size': model_size, 'options': options})
+        if 'error' in response:
+            raise Exception(response['error'])
+        print(f"Whisper server transcribed {len(files)} file(s) in {sum(response['latencies']):.2f}s after {response['queue_wait']:.2f}s in queue")
+        return response['results']
+
+    def stats(self) -> Dict[str, Any]:
+        return self._request({'op': 'stats'})
+
+    def _request(self, request):
+        with Client(self.address, authkey=self.authkey) as connection:
+            connection.send(request)
+            return connection.recv()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep whisper models loaded and serve transcriptions to ShortGPT engines")
+    parser.add_argument("--models", nargs="*", default=["base"], help="Model sizes to load at startup (default: base)")
+    parser.add_argument("--address", default=WHISPER_SERVER_ADDRESS or DEFAULT_WHISPER_SERVER_ADDRESS)
+    parser.add_argument("--generate-key", action="store_true",
+                        help=f"Generate a random client key into {WHISPER_SERVER_AUTHKEY_FILE} if no key is configured")
+    args = parser.parse_args()
+    authkey = load_authkey()
+    if not authkey and args.generate_key:
+        authkey = generate_authkey()
+        print(f"Generated a whisper server key in {WHISPER_SERVER_AUTHKEY_FILE}")
+    try:
+        server = WhisperServer(args.address, args.models, authkey=authkey)
+    except Exception as e:
+        sys.exit(str(e))
+    server.serve_forever()
@@ -1,5 +1,6 @@
 import enum
 import os
+import threading
 from shortGPT.database.db_document import TinyMongoDocument
 from dotenv import load_dotenv
 load_dotenv('./.env')
@@ -12,12 +13,24 @@ class ApiProvider(enum.Enum):
 
 class ApiKeyManager:
     api_key_doc_manager = TinyMongoDocument("api_db", "api_keys", "key_doc", create=True)
+    # Resolved keys, so each request doesn't read the database again. Invalidated by set_api_key
+    _api_keys = {}
+    _lock = threading.Lock()
 
     @classmethod
     def get_api_key(cls, key: str | ApiProvider):
         if isinstance(key, ApiProvider):
             key = key.value
-            
+        with cls._lock:
+            if key in cls._api_keys:
+                return cls._api_keys[key]
+        api_key = cls._load_api_key(key)
+        with cls._lock:
+            cls._api_keys[key] = api_key
+        return api_key
+
+    @classmethod
+    def _load_api_key(cls, key: str):
         # Check if the key is present in the database
         api_key = cls.api_key_doc_manager._get(key)
         if api_key:
@@ -35,4 +48,16 @@ class ApiKeyManager:
     def set_api_key(cls, key: str | ApiProvider, value: str):
         if isinstance(key, ApiProvider):
             key = key.value
-        return cls.api_key_doc_manager._save({key: value})
\ No newline at end of file
+        result = cls.api_key_doc_manager._save({key: value})
+        cls.clear_cache(key)
+        return result
+
+    @classmethod
+    def clear_cache(cls, key: str | ApiProvider = None):
+        if isinstance(key, ApiProvider):
+            key = key.value
+        with cls._lock:
+            if key is None:
+                cls._api_keys.clear()
+            else:
+                cls._api_keys.pop(key, None)
\ No newline at end of file
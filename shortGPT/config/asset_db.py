@@ -135,6 +135,20 @@ class AssetDatabase:
         else:
             raise ValueError(f"Asset '{key}' does not exist in the database.")
 
+    @classmethod
+    def get_asset_names(cls, asset_type: AssetType) -> list:
+        """
+        Get the names of the assets of a type.
+
+        Args:
+            asset_type (AssetType): Type of the assets.
+
+        Returns:
+            list: Names of the local and remote assets of that type.
+        """
+        assets = {**cls.remote_assets._get(), **cls.local_assets._get()}
+        return [name for name, asset in assets.items() if asset.get('type') == asset_type.value]
+
     @classmethod
     def get_asset_duration(cls, key: str) -> str:
         """
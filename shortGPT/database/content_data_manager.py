@@ -1,3 +1,6 @@
+import threading
+import time
+
 from shortGPT.database.db_document import AbstractDatabaseDocument
 
 
@@ -6,6 +9,12 @@ class ContentDataManager():
     def __init__(self, db_doc: AbstractDatabaseDocument, content_type: str, new=False):
         self.contentType = content_type
         self.db_doc = db_doc
+        # In write-behind mode, saves are buffered and written together by flush()
+        self.write_behind = False
+        self.flush_interval = None
+        self._pending = {}
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
         if new:
             self.db_doc._save({
                 'content_type': content_type,
@@ -13,10 +22,34 @@ class ContentDataManager():
                 'last_completed_step': 0,
             })
 
+    def set_write_behind(self, enabled=True, flush_interval=None):
+        '''Buffers saves in memory until flush(), or at most flush_interval seconds when it is set'''
+        if not enabled:
+            self.flush()
+        self.write_behind = enabled
+        self.flush_interval = flush_interval
+
     def save(self, key, value):
-        self.db_doc._save({key: value})
+        if not self.write_behind:
+            self.db_doc._save({key: value})
+            return
+        with self._lock:
+            self._pending[key] = value
+        if self.flush_interval is not None and time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        '''Writes every buffered save in a single database update'''
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.time()
+        if pending:
+            self.db_doc._save(pending)
 
     def get(self, key):
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key]
         return self.db_doc._get(key)
 
     def _getId(self):
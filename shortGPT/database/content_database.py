@@ -1,18 +1,32 @@
+import os
 from uuid import uuid4
 from shortGPT.database.db_document import TINY_MONGO_DATABASE, TinyMongoDocument
 
 from shortGPT.database.content_data_manager import ContentDataManager
+
+# Set CONTENT_DB_BACKEND=sqlite to store content documents in .database/content_db.sqlite3
+# (migrate the existing tinymongo json first with `python -m shortGPT.database.migrate_to_sqlite`)
+CONTENT_DB_BACKEND = os.getenv('CONTENT_DB_BACKEND', 'tinymongo')
+
+
 class ContentDatabase:
-    def __init__(self, ):
-        self.content_collection = TINY_MONGO_DATABASE["content_db"]["content_documents"]
+    def __init__(self, backend=CONTENT_DB_BACKEND):
+        self.backend = backend
+        if backend == 'sqlite':
+            from shortGPT.database.sqlite_document import SQLiteDocument, get_sqlite_database
+            self.document_class = SQLiteDocument
+            self.content_collection = get_sqlite_database("content_db")["content_documents"]
+        else:
+            self.document_class = TinyMongoDocument
+            self.content_collection = TINY_MONGO_DATABASE["content_db"]["content_documents"]
 
     def instanciateContentDataManager(self, id: str, content_type: str, new=False):
-        db_doc = TinyMongoDocument("content_db", "content_documents", id)
+        db_doc = self.document_class("content_db", "content_documents", id)
         return ContentDataManager(db_doc, content_type, new)
 
     def getContentDataManager(self, id, content_type: str):
         try:
-            db_doc = TinyMongoDocument("content_db", "content_documents", id)
+            db_doc = self.document_class("content_db", "content_documents", id)
             return ContentDataManager(db_doc, content_type, False)
         except:
             return None
@@ -20,9 +34,9 @@ class ContentDatabase:
     def createContentDataManager(self, content_type: str) -> ContentDataManager:
         try:
             new_short_id = uuid4().hex[:24]
-            db_doc = TinyMongoDocument("content_db", "content_documents", new_short_id, True)
+            db_doc = self.document_class("content_db", "content_documents", new_short_id, True)
             return ContentDataManager(db_doc, content_type, True)
         except:
             return None
     
-    
\ No newline at end of file
+    
@@ -0,0 +1,48 @@
+import argparse
+import json
+import os
+
+from shortGPT.database.sqlite_document import SQLITE_DATABASE_DIR, get_sqlite_database
+
+
+def migrate_tinymongo_to_sqlite(db_name="content_db", database_dir=SQLITE_DATABASE_DIR):
+    """Copies every document of a tinymongo json database (.database/<db_name>.json) into .database/<db_name>.sqlite3.
+    Args:
+        db_name (str): Name of the database to migrate.
+        database_dir (str): Folder holding the tinymongo json files.
+    Returns:
+        int: Number of migrated documents.
+    """
+    json_path = os.path.join(database_dir, f"{db_name}.json")
+    if not os.path.exists(json_path):
+        raise Exception(f"No tinymongo database found at {json_path}")
+    with open(json_path, 'r', encoding='utf-8') as f:
+        tables = json.load(f)
+    database = get_sqlite_database(db_name, database_dir)
+    connection = database.connection()
+    count = 0
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        # tinydb stores each collection as a table of {doc_number: document}
+        for collection_name, documents in tables.items():
+            collection = database[collection_name]
+            for document in documents.values():
+                if '_id' not in document:
+                    continue
+                collection.insert_one(document)
+                count += 1
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate ShortGPT tinymongo json databases to sqlite")
+    parser.add_argument("db_names", nargs="*", default=["content_db"], help="Databases to migrate (default: content_db)")
+    parser.add_argument("--database-dir", default=SQLITE_DATABASE_DIR)
+    args = parser.parse_args()
+    for name in args.db_names:
+        migrated = migrate_tinymongo_to_sqlite(name, args.database_dir)
+        print(f"Migrated {migrated} documents from {name}.json to {name}.sqlite3")
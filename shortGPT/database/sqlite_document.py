@@ -0,0 +1,190 @@
+import json
+import os
+import sqlite3
+import threading
+
+from shortGPT.database.db_document import AbstractDatabaseDocument
+
+SQLITE_DATABASE_DIR = "./.database"
+# Document fields copied into their own indexed columns, so lookups don't scan the json of every document
+INDEXED_FIELDS = ('content_type', 'src_url', 'ready_to_upload')
+
+
+class SQLiteDatabase:
+    '''A sqlite file in WAL mode holding every collection of a database, one row per document'''
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        connection = self.connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                content_type TEXT,
+                src_url TEXT,
+                ready_to_upload INTEGER,
+                PRIMARY KEY (collection, id)
+            )""")
+        for field in INDEXED_FIELDS:
+            connection.execute(f"CREATE INDEX IF NOT EXISTS idx_documents_{field} ON documents (collection, {field})")
+
+    def connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads, each thread gets its own
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            # Autocommit mode, multi-statement writes open their own transactions
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def __getitem__(self, collection_name):
+        return SQLiteCollection(self, collection_name)
+
+
+SQLITE_DATABASES = {}
+_databases_lock = threading.Lock()
+
+
+def get_sqlite_database(db_name: str, database_dir=SQLITE_DATABASE_DIR) -> SQLiteDatabase:
+    path = os.path.join(database_dir, f"{db_name}.sqlite3")
+    with _databases_lock:
+        if path not in SQLITE_DATABASES:
+            if not os.path.exists(database_dir):
+                os.makedirs(database_dir)
+            SQLITE_DATABASES[path] = SQLiteDatabase(path)
+        return SQLITE_DATABASES[path]
+
+
+def _indexed_values(document):
+    ready_to_upload = document.get('ready_to_upload')
+    return (document.get('content_type'), document.get('src_url'),
+            None if ready_to_upload is None else int(bool(ready_to_upload)))
+
+
+class SQLiteCollection:
+    '''Subset of the tinymongo collection API used by the content engines'''
+
+    def __init__(self, database: SQLiteDatabase, collection_name: str):
+        self.database = database
+        self.collection_name = collection_name
+
+    def insert_one(self, document):
+        document = dict(document)
+        document_id = document.pop('_id')
+        self.database.connection().execute("INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?)",
+                                           (self.collection_name, document_id, json.dumps(document), *_indexed_values(document)))
+
+    def find(self, query=None):
+        query = query or {}
+        sql = "SELECT id, data FROM documents WHERE collection = ?"
+        params = [self.collection_name]
+        for field in INDEXED_FIELDS:
+            if field in query and not isinstance(query[field], dict):
+                value = query[field]
+                sql += f" AND {field} = ?"
+                params.append(int(bool(value)) if field == 'ready_to_upload' else value)
+        if '_id' in query:
+            sql += " AND id = ?"
+            params.append(query['_id'])
+        for document_id, data in self.database.connection().execute(sql, params):
+            document = json.loads(data)
+            document['_id'] = document_id
+            if all(document.get(key) == value for key, value in query.items()):
+                yield document
+
+    def find_one(self, query=None):
+        return next(self.find(query), None)
+
+
+class SQLiteDocument(AbstractDatabaseDocument):
+    '''
+    Drop-in replacement for TinyMongoDocument storing each document as one sqlite row.
+    Saving a key rewrites that row only, instead of the whole database file.
+    '''
+
+    def __init__(self, db_name: str, collection_name: str, document_id: str, create=False):
+        self.database = get_sqlite_database(db_name)
+        self.collection = self.database[collection_name]
+        self.collection_name = collection_name
+        self.document_id = document_id
+        if (not self.exists()):
+            if create:
+                self.collection.insert_one({"_id": document_id})
+            else:
+                raise Exception(f"The document with id {document_id} in collection {collection_name} of database {db_name} does not exist")
+
+    def exists(self):
+        row = self.database.connection().execute("SELECT 1 FROM documents WHERE collection = ? AND id = ?",
+                                                 (self.collection_name, self.document_id)).fetchone()
+        return row is not None
+
+    def _read(self, connection):
+        row = connection.execute("SELECT data FROM documents WHERE collection = ? AND id = ?",
+                                 (self.collection_name, self.document_id)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _write(self, connection, document):
+        connection.execute("UPDATE documents SET data = ?, content_type = ?, src_url = ?, ready_to_upload = ? WHERE collection = ? AND id = ?",
+                           (json.dumps(document), *_indexed_values(document), self.collection_name, self.document_id))
+
+    def _save(self, data):
+        connection = self.database.connection()
+        try:
+            # BEGIN IMMEDIATE takes the write lock before reading, so concurrent saves can't lose updates
+            connection.execute("BEGIN IMMEDIATE")
+            document = self._read(connection)
+            for key, value in data.items():
+                path_parts = key.split(".")
+                parent = document
+                for part in path_parts[:-1]:
+                    if not isinstance(parent.get(part), dict):
+                        parent[part] = {}
+                    parent = parent[part]
+                parent[path_parts[-1]] = value
+            self._write(connection, document)
+            connection.execute("COMMIT")
+        except Exception as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            print(f"Error saving data: {e}")
+
+    def _get(self, key=None):
+        try:
+            document = self._read(self.database.connection())
+            if not key:
+                return document
+            keys = key.split(".")
+            value = document[keys[0]]
+            for k in keys[1:]:
+                value = value[k]
+            return value
+        except Exception as e:
+            return None
+
+    def _delete(self, key):
+        connection = self.database.connection()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            document = self._read(connection)
+            if key in document:
+                del document[key]
+                self._write(connection, document)
+            else:
+                print(f"Key '{key}' not found in the document")
+            connection.execute("COMMIT")
+        except Exception as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            print(f"Error deleting key '{key}': {e}")
+
+    def _getId(self):
+        return self.document_id
+
+    def __str__(self):
+        document = self._get()
+        document['_id'] = self.document_id
+        return str(document)
@@ -2,6 +2,10 @@ from urllib.error import HTTPError
 from shortGPT.config.path_utils import get_program_path
 import os
 from shortGPT.config.path_utils import handle_path
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 from typing import Any, Dict, List, Union
 from moviepy import (AudioFileClip, CompositeVideoClip, CompositeAudioClip, ImageClip,
@@ -9,11 +13,51 @@ from moviepy import (AudioFileClip, CompositeVideoClip, CompositeAudioClip, Imag
 from moviepy.Clip import Clip
 from moviepy import vfx, afx
 from shortGPT.editing_framework.rendering_logger import MoviepyProgressLogger
+from shortGPT.editing_framework.static_layers import precomposite_static_layers
+from shortGPT.editing_framework.text_sprite_cache import TEXT_SPRITE_CACHE
 import json
 
+RENDER_FPS = 25
+
 def load_schema(json_path):
     return json.loads(open(json_path, 'r', encoding='utf-8').read())
 
+
+def get_segment_boundaries(schema:Dict[str, Any], duration, segments) -> List[float]:
+    """Splits [0, duration] into at most `segments` chunks, cutting on caption / scene boundaries when possible.
+    Boundaries are rounded to frames, so each chunk holds a whole number of frames."""
+    candidates = set()
+    for asset in schema['visual_assets'].values():
+        for action in asset['actions']:
+            if action['type'] in ('set_time_start', 'set_time_end') and isinstance(action['param'], (int, float)):
+                candidates.add(round(action['param'] * RENDER_FPS) / RENDER_FPS)
+    last_frame_time = int(duration * RENDER_FPS) / RENDER_FPS
+    candidates = sorted(t for t in candidates if 0 < t < last_frame_time)
+    boundaries = [0]
+    for k in range(1, segments):
+        ideal = duration * k / segments
+        if candidates:
+            cut = min(candidates, key=lambda t: abs(t - ideal))
+            # Only snap to a scene boundary when it is reasonably close to an even split
+            if abs(cut - ideal) > duration / (2 * segments):
+                cut = round(ideal * RENDER_FPS) / RENDER_FPS
+        else:
+            cut = round(ideal * RENDER_FPS) / RENDER_FPS
+        if boundaries[-1] < cut < last_frame_time:
+            boundaries.append(cut)
+    boundaries.append(duration)
+    return boundaries
+
+
+def _render_video_segment(schema, force_duration, start, end, output_file, threads):
+    """Worker process entry point: renders the frames of [start, end) without audio"""
+    video = CoreEditingEngine().build_video(schema, force_duration=force_duration)
+    segment = video.without_audio().subclipped(start, end)
+    segment.write_videofile(output_file, threads=threads, codec='libx264', audio=False, fps=RENDER_FPS, preset='veryfast', logger=None)
+    video.close()
+    return output_file
+
+
 class CoreEditingEngine:
 
     def generate_image(self, schema:Dict[str, Any],output_file , logger=None):
@@ -37,10 +81,73 @@ class CoreEditingEngine:
         return output_file
 
     def generate_video(self, schema:Dict[str, Any], output_file, logger=None, force_duration=None, threads=None) -> None:
+        video = self.build_video(schema, force_duration=force_duration)
+        if logger:
+            my_logger = MoviepyProgressLogger(callBackFunction=logger)
+            video.write_videofile(output_file, threads=threads,codec='libx264', audio_codec='aac', fps=RENDER_FPS, preset='veryfast', logger=my_logger)
+        else:
+            video.write_videofile(output_file, threads=threads,codec='libx264', audio_codec='aac', fps=RENDER_FPS, preset='veryfast')
+        if logger:
+            logger(f"Text sprite cache: {TEXT_SPRITE_CACHE.stats()}")
+        return output_file
+
+    def generate_video_segmented(self, schema:Dict[str, Any], output_file, logger=None, force_duration=None, segments=None) -> None:
+        """Renders the timeline as independent chunks in parallel worker processes, then joins them without re-encoding.
+        Args:
+            schema (dict): The editing schema.
+            output_file (str): The output file path for the rendered video.
+            logger (function): Optional callback receiving progress strings.
+            force_duration (float): Optional duration of the rendered video.
+            segments (int): Number of chunks to render, defaults to the number of CPU cores.
+        """
+        segments = segments or os.cpu_count() or 1
+        video = self.build_video(schema, force_duration=force_duration)
+        boundaries = get_segment_boundaries(schema, video.duration, segments)
+        if len(boundaries) < 3:
+            return self.generate_video(schema, output_file, logger=logger, force_duration=force_duration)
+
+        work_dir = tempfile.mkdtemp(prefix="segments_", dir=os.path.dirname(os.path.abspath(output_file)))
+        try:
+            n_segments = len(boundaries) - 1
+            threads = max(1, (os.cpu_count() or 1) // n_segments)
+            segment_files = [os.path.join(work_dir, f"segment_{i}.mp4") for i in range(n_segments)]
+            with ProcessPoolExecutor(max_workers=n_segments) as executor:
+                futures = [executor.submit(_render_video_segment, schema, force_duration, boundaries[i], boundaries[i+1], segment_files[i], threads)
+                           for i in range(n_segments)]
+                audio_file = None
+                if video.audio is not None:
+                    audio_file = os.path.join(work_dir, "audio.m4a")
+                    video.audio.write_audiofile(audio_file, fps=44100, codec='aac', logger=None)
+                for i, future in enumerate(as_completed(futures)):
+                    future.result()
+                    progress_string = f'Rendering progress : segment {i+1}/{n_segments}'
+                    if logger:
+                        logger(progress_string)
+                    else:
+                        print(progress_string)
+
+            concat_list = os.path.join(work_dir, "segments.txt")
+            with open(concat_list, 'w', encoding='utf-8') as f:
+                for segment_file in segment_files:
+                    f.write(f"file '{segment_file}'\n")
+            command = ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', concat_list]
+            if audio_file:
+                command += ['-i', audio_file, '-map', '0:v', '-map', '1:a']
+            command += ['-c', 'copy', '-t', str(video.duration), output_file]
+            subprocess.run(command, check=True)
+        finally:
+            video.close()
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if not os.path.exists(output_file):
+            raise Exception("Segmented render failed to be written")
+        return output_file
+
+    def build_video(self, schema:Dict[str, Any], force_duration=None, precomposite_static=True) -> CompositeVideoClip:
         visual_assets = dict(sorted(schema['visual_assets'].items(), key=lambda item: item[1]['z']))
         audio_assets = dict(sorted(schema['audio_assets'].items(), key=lambda item: item[1]['z']))
         
         visual_clips = []
+        static_clips = []
         for asset_key in visual_assets:
             asset = visual_assets[asset_key]
             asset_type = asset['type']
@@ -59,7 +166,12 @@ class CoreEditingEngine:
                 raise ValueError(f'Invalid asset type: {asset_type}')
 
             visual_clips.append(clip)
-        
+            static_clips.append(asset_type in ('image', 'text'))
+
+        size = visual_clips[0].size
+        if precomposite_static:
+            visual_clips = precomposite_static_layers(visual_clips, static_clips, size)
+
         audio_clips = []
 
         for asset_key in audio_assets:
@@ -71,19 +183,14 @@ class CoreEditingEngine:
                 raise ValueError(f"Invalid asset type: {asset_type}")
 
             audio_clips.append(audio_clip)
-        video = CompositeVideoClip(visual_clips)
+        video = CompositeVideoClip(visual_clips, size=size)
         if(audio_clips):
             audio = CompositeAudioClip(audio_clips)
             video = video.with_audio(audio)
             video = video.with_duration(audio.duration)
         if force_duration:
             video = video.with_duration(force_duration)
-        if logger:
-            my_logger = MoviepyProgressLogger(callBackFunction=logger)
-            video.write_videofile(output_file, threads=threads,codec='libx264', audio_codec='aac', fps=25, preset='veryfast', logger=my_logger)
-        else:
-            video.write_videofile(output_file, threads=threads,codec='libx264', audio_codec='aac', fps=25, preset='veryfast')
-        return output_file
+        return video
     
     def generate_audio(self, schema:Dict[str, Any], output_file, logger=None) -> None:
         audio_assets = dict(sorted(schema['audio_assets'].items(), key=lambda item: item[1]['z']))
@@ -203,25 +310,9 @@ class CoreEditingEngine:
         clip = ImageClip(asset['parameters']['url'])
         return self.process_common_visual_actions(clip, asset['actions'])
 
-    def process_text_asset(self, asset: Dict[str, Any]) -> TextClip:
-        text_clip_params = asset['parameters']
-        
-        if not (any(key in text_clip_params for key in ['text','fontsize', 'size'])):
-            raise Exception('You must include at least a size or a fontsize to determine the size of your text')
-        text_method = text_clip_params.get('method', 'label')
-        clip_info = {
-            'text': text_clip_params['text'],
-            'font': text_clip_params.get('font'),
-            'font_size': text_clip_params.get('font_size'),
-            'color': text_clip_params.get('color'),
-            'stroke_width': text_clip_params.get('stroke_width'),
-            'stroke_color': text_clip_params.get('stroke_color'),
-            'size': text_clip_params.get('size'),
-            'method': text_method,
-            'text_align': text_clip_params.get('text_align', 'center')
-        }
-        clip_info = {k: v for k, v in clip_info.items() if v is not None}
-        clip = TextClip(**clip_info)
+    def process_text_asset(self, asset: Dict[str, Any]) -> ImageClip:
+        sprite = TEXT_SPRITE_CACHE.get_sprite(asset['parameters'])
+        clip = ImageClip(sprite, transparent=True)
         return self.process_common_visual_actions(clip, asset['actions'])
 
     def process_audio_asset(self, asset: Dict[str, Any]) -> AudioFileClip:
@@ -247,13 +338,8 @@ class CoreEditingEngine:
         [dimensions, ] = np.shape(shape)
 
         if dimensions == 2:
-            (height, width) = shape
-            normalized_frame = np.zeros((height, width, 3))
-            for y in range(height):
-                for x in range(width):
-                    grey_value = frame[y][x]
-                    normalized_frame[y][x] = (grey_value, grey_value, grey_value)
-            return normalized_frame
+            # Greyscale frame, the grey value is repeated on the 3 channels
+            return np.repeat(np.asarray(frame)[:, :, np.newaxis], 3, axis=2)
         else:
             return frame
         
@@ -1,9 +1,17 @@
 import json
+import os
+import pickle
+import threading
 from typing import Any, Dict, List, Union
 from enum import Enum
 import collections.abc
 
 from shortGPT.editing_framework.core_editing_engine import CoreEditingEngine
+from shortGPT.editing_framework.ffmpeg_editing_engine import (FFmpegEditingEngine,
+                                                              UnsupportedEditingAction)
+from shortGPT.editing_framework.image_preparation import prepare_image_assets
+from shortGPT.editing_framework.render_cache import (RENDER_CACHE,
+                                                     RENDER_CACHE_ENABLED)
 
 def update_dict(d, u):
     for k, v in u.items():
@@ -16,6 +24,7 @@ def update_dict(d, u):
 
 class EditingStep(Enum):
     CROP_1920x1080 = "crop_1920x1080_to_short.json"
+    ADD_BACKGROUND_SHORT = "add_background_short.json"
     ADD_CAPTION_SHORT = "make_caption.json"
     ADD_CAPTION_SHORT_ARABIC = "make_caption_arabic.json"
     ADD_CAPTION_LANDSCAPE = "make_caption_landscape.json"
@@ -23,6 +32,7 @@ class EditingStep(Enum):
     ADD_WATERMARK = "show_watermark.json"
     ADD_SUBSCRIBE_ANIMATION = "subscribe_animation.json"
     SHOW_IMAGE = "show_top_image.json"
+    ADD_IMAGE = "add_image_overlay.json"
     ADD_VOICEOVER_AUDIO = "add_voiceover.json"
     ADD_BACKGROUND_MUSIC = "background_music.json"
     ADD_REDDIT_IMAGE = "show_reddit_image.json"
@@ -34,20 +44,70 @@ class EditingStep(Enum):
 class Flow(Enum):
     WHITE_REDDIT_IMAGE_FLOW = "build_reddit_image.json"
 
+class RenderBackend(Enum):
+    MOVIEPY = "moviepy"
+    MOVIEPY_SEGMENTED = "moviepy_segmented"
+    FFMPEG = "ffmpeg"
+
 from pathlib import Path
 
 _here = Path(__file__).parent
 STEPS_PATH = (_here / 'editing_steps/').resolve()
 FLOWS_PATH = (_here / 'flows/').resolve()
 
+class EditingTemplateRegistry:
+    """
+    Process-wide cache of the json templates of editing steps and flows.
+    Each file is parsed once and reloaded only when its modification time changes.
+    Templates are kept pickled, so every caller gets its own cheap deep copy.
+    """
+    _lock = threading.Lock()
+    _templates = {}
+
+    @classmethod
+    def get_template(cls, path) -> Dict[str, Any]:
+        return pickle.loads(cls._get_blob(path))
+
+    @classmethod
+    def get_templates(cls, path, count) -> List[Dict[str, Any]]:
+        blob = cls._get_blob(path)
+        return [pickle.loads(blob) for _ in range(count)]
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._templates.clear()
+
+    @classmethod
+    def _get_blob(cls, path) -> bytes:
+        path = str(path)
+        mtime = os.stat(path).st_mtime_ns
+        with cls._lock:
+            cached = cls._templates.get(path)
+            if cached and cached[0] == mtime:
+                return cached[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            blob = pickle.dumps(json.loads(f.read()), protocol=pickle.HIGHEST_PROTOCOL)
+        with cls._lock:
+            cls._templates[path] = (mtime, blob)
+        return blob
+
+
 class EditingEngine:
     def __init__(self,):
         self.editing_step_tracker = dict((step, 0) for step in EditingStep)
         self.schema = {'visual_assets': {}, 'audio_assets': {}}
 
     def addEditingStep(self, editingStep: EditingStep, args: Dict[str, any] = {}):
-        json_step = json.loads(
-            open(STEPS_PATH / f"{editingStep.value}", 'r', encoding='utf-8').read())
+        json_step = EditingTemplateRegistry.get_template(STEPS_PATH / f"{editingStep.value}")
+        self._addEditingStepFromTemplate(editingStep, json_step, args)
+
+    def addEditingSteps(self, editingStep: EditingStep, list_of_args: List[Dict[str, any]]):
+        json_steps = EditingTemplateRegistry.get_templates(STEPS_PATH / f"{editingStep.value}", len(list_of_args))
+        for json_step, args in zip(json_steps, list_of_args):
+            self._addEditingStepFromTemplate(editingStep, json_step, args)
+
+    def _addEditingStepFromTemplate(self, editingStep: EditingStep, json_step: Dict[str, Any], args: Dict[str, any]):
         step_name, editingStepDict = list(json_step.items())[0]
         if 'inputs' in editingStepDict:
             required_args = (editingStepDict['inputs']['actions'] if 'actions' in editingStepDict['inputs'] else []) + (editingStepDict['inputs']['parameters'] if 'parameters' in editingStepDict['inputs'] else [])
@@ -78,7 +138,7 @@ class EditingEngine:
 
 
     def ingestFlow(self, flow: Flow, args):
-        json_flow = json.loads(open(FLOWS_PATH / f"{flow.value}", 'r', encoding='utf-8').read())
+        json_flow = EditingTemplateRegistry.get_template(FLOWS_PATH / f"{flow.value}")
         for required_argument in list(json_flow['inputs'].keys()):
                 if required_argument not in args:
                     raise Exception(
@@ -92,10 +152,36 @@ class EditingEngine:
     def dumpEditingSchema(self):
         return self.schema
     
-    def renderVideo(self, outputPath, logger=None):
+    def renderVideo(self, outputPath, logger=None, backend: RenderBackend = RenderBackend.MOVIEPY, segments=None, use_cache=None):
+        # Images are converted and resized once, the schema then points to the prepared files
+        prepare_image_assets(self.schema)
+        if use_cache is None:
+            use_cache = RENDER_CACHE_ENABLED
+        if use_cache and RENDER_CACHE.get(self.schema, outputPath):
+            print(f"Render cache hit, reusing a previous render for {outputPath}")
+            return
+        if use_cache and os.path.exists(outputPath):
+            # The old file may be hard-linked into the cache, never overwrite it in place
+            os.remove(outputPath)
+        self._renderVideo(outputPath, logger=logger, backend=backend, segments=segments)
+        if use_cache:
+            RENDER_CACHE.put(self.schema, outputPath)
+
+    def _renderVideo(self, outputPath, logger=None, backend: RenderBackend = RenderBackend.MOVIEPY, segments=None):
+        if backend == RenderBackend.MOVIEPY_SEGMENTED:
+            engine = CoreEditingEngine()
+            engine.generate_video_segmented(self.schema, outputPath, logger=logger, segments=segments)
+            return
+        if backend == RenderBackend.FFMPEG:
+            try:
+                FFmpegEditingEngine().generate_video(self.schema, outputPath, logger=logger)
+                return
+            except UnsupportedEditingAction as e:
+                print(f"ffmpeg render backend can't render this schema ({e}), falling back to moviepy")
         engine = CoreEditingEngine()
         engine.generate_video(self.schema, outputPath, logger=logger)
     def renderImage(self, outputPath, logger=None):
+        prepare_image_assets(self.schema)
         engine = CoreEditingEngine()
         engine.generate_image(self.schema, outputPath, logger=logger)
     def generateAudio(self, outputPath, logger=None):
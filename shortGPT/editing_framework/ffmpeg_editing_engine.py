@@ -0,0 +1,367 @@
+import json
+import math
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+from shortGPT.audio.audio_duration import get_duration_ffprobe
+from shortGPT.config.path_utils import handle_path
+from shortGPT.editing_framework.layer_sizing import auto_resize_size, resize_size
+from shortGPT.editing_framework.rendering_logger import FFmpegProgressLogger
+from shortGPT.editing_framework.text_sprite_cache import TEXT_SPRITE_CACHE
+
+RENDER_FPS = 25
+AUDIO_SAMPLE_RATE = 44100
+
+# Actions that CoreEditingEngine understands and the filtergraph compiler cannot reproduce.
+# Any other unknown action is ignored, exactly like CoreEditingEngine does.
+UNSUPPORTED_ACTIONS = {'normalize_music'}
+
+
+class UnsupportedEditingAction(Exception):
+    '''Raised when a schema cannot be expressed as a single ffmpeg filtergraph'''
+    pass
+
+
+def _num(value):
+    return f"{float(value):.6f}".rstrip('0').rstrip('.')
+
+
+def _probe_size(url) -> Tuple[int, int]:
+    cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-select_streams', 'v:0', '-show_streams', '-i', url]
+    output = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if output.returncode != 0:
+        raise UnsupportedEditingAction(f"Could not probe the size of {url}")
+    stream = json.loads(output.stdout)['streams'][0]
+    return int(stream['width']), int(stream['height'])
+
+
+def _probe_duration(url) -> float:
+    duration, _ = get_duration_ffprobe(url)
+    if duration is None:
+        raise UnsupportedEditingAction(f"Could not probe the duration of {url}")
+    return duration
+
+
+def _get_timing(actions: List[Dict[str, Any]]):
+    '''Mirrors CoreEditingEngine.process_common_actions: returns (start, end, subclip)'''
+    start, end, subclip = 0, None, None
+    for action in actions:
+        if action['type'] == 'set_time_start':
+            start = action['param'] or 0
+        elif action['type'] == 'set_time_end':
+            end = action['param']
+        elif action['type'] == 'subclip':
+            subclip = action['param']
+    return start, end, subclip
+
+
+def _crop_box(param: Dict[str, Any], size: Optional[Tuple[int, int]] = None):
+    '''Same rules as moviepy's vfx.Crop. Returns (x1, y1, width, height), sizes may be None when size is unknown'''
+    x1, y1, x2, y2 = param.get('x1'), param.get('y1'), param.get('x2'), param.get('y2')
+    width, height = param.get('width'), param.get('height')
+    x_center, y_center = param.get('x_center'), param.get('y_center')
+    if width and x1 is not None:
+        x2 = x1 + width
+    elif width and x2 is not None:
+        x1 = x2 - width
+    if height and y1 is not None:
+        y2 = y1 + height
+    elif height and y2 is not None:
+        y1 = y2 - height
+    if x_center:
+        x1, x2 = x_center - width / 2, x_center + width / 2
+    if y_center:
+        y1, y2 = y_center - height / 2, y_center + height / 2
+    x1 = x1 or 0
+    y1 = y1 or 0
+    if x2 is None and size:
+        x2 = size[0]
+    if y2 is None and size:
+        y2 = size[1]
+    return x1, y1, (x2 - x1) if x2 is not None else None, (y2 - y1) if y2 is not None else None
+
+
+def _layer_size(size: Tuple[int, int], actions: List[Dict[str, Any]]) -> Tuple[int, int]:
+    '''Computes the on-screen size of a layer after its crop / resize actions'''
+    for action in actions:
+        if action['type'] == 'crop':
+            _, _, width, height = _crop_box(action['param'], size)
+            size = (int(width), int(height))
+        elif action['type'] == 'resize':
+            size = resize_size(action['param'], size)
+        elif action['type'] == 'auto_resize_image':
+            size = auto_resize_size(action['param'], size)
+    return size
+
+
+def _resize_filter(param: Dict[str, Any]) -> str:
+    new_size, width, height = param.get('new_size'), param.get('width'), param.get('height')
+    if new_size is not None:
+        if isinstance(new_size, (int, float)):
+            return f"scale=w='iw*{_num(new_size)}':h='ih*{_num(new_size)}'"
+        if isinstance(new_size, (list, tuple)):
+            return f"scale={int(new_size[0])}:{int(new_size[1])}"
+        raise UnsupportedEditingAction(f"Unsupported resize parameter: {param}")
+    if width is not None and height is not None:
+        return f"scale={int(width)}:{int(height)}"
+    if height is not None:
+        return f"scale=-1:{int(height)}"
+    if width is not None:
+        return f"scale={int(width)}:-1"
+    raise UnsupportedEditingAction(f"Unsupported resize parameter: {param}")
+
+
+def _crop_filter(param: Dict[str, Any]) -> str:
+    x1, y1, width, height = _crop_box(param)
+    width = _num(width) if width is not None else f"'iw-{_num(x1)}'"
+    height = _num(height) if height is not None else f"'ih-{_num(y1)}'"
+    return f"crop={width}:{height}:{_num(x1)}:{_num(y1)}"
+
+
+def _auto_resize_filter(param: Dict[str, Any]) -> str:
+    max_width, max_height = _num(param['maxWidth']), _num(param['maxHeight'])
+    return (f"scale=w='if(lt(iw/ih,1),{max_height}*iw/ih,{max_width})'"
+            f":h='if(lt(iw/ih,1),{max_height},{max_width}*ih/iw)'")
+
+
+def _green_screen_filter(param: Dict[str, Any]) -> str:
+    color = param['color'] if param.get('color') else [52, 255, 20]
+    thr = param['threshold'] if param.get('threshold') else 100
+    s = param['stiffness'] if param.get('stiffness') else 5
+    # colorkey works on a normalized RGB distance, MaskColor on the raw one.
+    similarity = min(max(thr / (255 * math.sqrt(3)), 0.01), 1)
+    blend = min(0.5 / s, 1)
+    hex_color = ''.join(f"{int(c):02X}" for c in color)
+    return f"colorkey=color=0x{hex_color}:similarity={_num(similarity)}:blend={_num(blend)}"
+
+
+def _position_expressions(param: Dict[str, Any]) -> Tuple[str, str]:
+    pos = param.get('pos', 'center')
+    relative = param.get('relative', False)
+    if isinstance(pos, str):
+        pos = [pos, pos]
+    anchors = ({'left': '0', 'center': '(W-w)/2', 'right': 'W-w'},
+               {'top': '0', 'center': '(H-h)/2', 'bottom': 'H-h'})
+    expressions = []
+    for value, canvas, axis_anchors in zip(pos, ('W', 'H'), anchors):
+        if isinstance(value, str):
+            if value not in axis_anchors:
+                raise UnsupportedEditingAction(f"Unsupported screen position: {pos}")
+            expressions.append(axis_anchors[value])
+        elif relative:
+            expressions.append(f"{canvas}*{_num(value)}")
+        else:
+            expressions.append(_num(value))
+    return expressions[0], expressions[1]
+
+
+def _visual_filters(actions: List[Dict[str, Any]]) -> List[str]:
+    filters = []
+    for action in actions:
+        if action['type'] in UNSUPPORTED_ACTIONS:
+            raise UnsupportedEditingAction(f"Action '{action['type']}' is not supported by the ffmpeg backend")
+        if action['type'] == 'resize':
+            filters.append(_resize_filter(action['param']))
+        elif action['type'] == 'crop':
+            filters.append(_crop_filter(action['param']))
+        elif action['type'] == 'auto_resize_image':
+            filters.append(_auto_resize_filter(action['param']))
+        elif action['type'] == 'green_screen':
+            filters.append(_green_screen_filter(action['param']))
+        # normalize_image is implied by the rgba conversion of every layer
+    return filters
+
+
+class FFmpegEditingEngine:
+    '''
+    Compiles an editing schema into a single ffmpeg -filter_complex invocation.
+    Text assets are overlaid like images, from the RGBA sprites of TEXT_SPRITE_CACHE.
+    Raises UnsupportedEditingAction when the schema can't be expressed, so callers can fall back to CoreEditingEngine.
+    '''
+
+    def generate_video(self, schema: Dict[str, Any], output_file, logger=None, force_duration=None, threads=None) -> str:
+        command, duration = self.build_command(schema, output_file, force_duration=force_duration, threads=threads)
+        progress = FFmpegProgressLogger(math.ceil(duration * RENDER_FPS), callBackFunction=logger)
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for line in process.stdout:
+            progress.progress_callback(line)
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            raise Exception(f"ffmpeg render of {output_file} failed: {stderr.strip()}")
+        if logger:
+            logger(f"Text sprite cache: {TEXT_SPRITE_CACHE.stats()}")
+        return output_file
+
+    def build_command(self, schema: Dict[str, Any], output_file, force_duration=None, threads=None) -> Tuple[List[str], float]:
+        visual_assets = sorted(schema['visual_assets'].values(), key=lambda asset: asset['z'])
+        audio_assets = sorted(schema['audio_assets'].values(), key=lambda asset: asset['z'])
+        if not visual_assets:
+            raise UnsupportedEditingAction("The ffmpeg backend needs at least one visual asset")
+
+        audio_layers = [self._compile_audio_layer(asset) for asset in audio_assets]
+        visual_layers = [self._compile_visual_layer(asset) for asset in visual_assets]
+        if not audio_layers and any(layer['has_audio'] for layer in visual_layers):
+            raise UnsupportedEditingAction("Video assets with embedded audio are only supported by the moviepy backend")
+
+        duration = force_duration or self._get_total_duration(visual_layers, audio_layers)
+        width, height = visual_layers[0]['size']()
+        width, height = width - width % 2, height - height % 2
+
+        inputs, filters = [], [f"color=c=black:s={width}x{height}:r={RENDER_FPS}:d={_num(duration)}[base0]"]
+        base = 'base0'
+        for i, layer in enumerate(visual_layers):
+            index = len(inputs)
+            inputs.append(layer['input'](duration))
+            filters.append(f"[{index}:v]" + ','.join(layer['filters']) + f"[layer{i}]")
+            x, y = layer['position']
+            end = layer['end'] if layer['end'] is not None else duration
+            eof_action = 'repeat' if layer['end'] is not None else 'pass'
+            filters.append(f"[{base}][layer{i}]overlay=x='{x}':y='{y}':eof_action={eof_action}"
+                           f":enable='between(t,{_num(layer['start'])},{_num(end)})'[base{i + 1}]")
+            base = f"base{i + 1}"
+
+        audio_labels = []
+        for i, layer in enumerate(audio_layers):
+            index = len(inputs)
+            inputs.append(['-i', layer['url']])
+            filters.append(f"[{index}:a]" + ','.join(layer['filters']) + f"[audio{i}]")
+            audio_labels.append(f"[audio{i}]")
+        if audio_labels:
+            filters.append(''.join(audio_labels) +
+                           f"amix=inputs={len(audio_labels)}:duration=longest:dropout_transition=0:normalize=0[aout]")
+
+        command = ['ffmpeg', '-y', '-loglevel', 'error', '-nostats', '-progress', 'pipe:1']
+        for input_args in inputs:
+            command += input_args
+        command += ['-filter_complex', ';'.join(filters), '-map', f"[{base}]"]
+        if audio_labels:
+            command += ['-map', '[aout]', '-c:a', 'aac']
+        if threads:
+            command += ['-threads', str(threads)]
+        command += ['-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p',
+                    '-r', str(RENDER_FPS), '-t', _num(duration), output_file]
+        return command, duration
+
+    def _compile_visual_layer(self, asset: Dict[str, Any]) -> Dict[str, Any]:
+        asset_type = asset['type']
+        actions = asset['actions']
+        start, end, subclip = _get_timing(actions)
+        filters = []
+        has_audio = False
+        if asset_type == 'video':
+            url = handle_path(asset['parameters']['url'])
+            has_audio = asset['parameters'].get('audio', True) is not False
+            clip_start, clip_end = 0, None
+            if subclip:
+                clip_start, clip_end = subclip.get('start_time', 0), subclip.get('end_time')
+                trim = f"trim=start={_num(clip_start)}"
+                if clip_end is not None:
+                    trim += f":end={_num(clip_end)}"
+                filters.append(trim + ",setpts=PTS-STARTPTS")
+            if end is not None:
+                filters.append(f"trim=duration={_num(end - start)}")
+            filters.append(f"fps={RENDER_FPS}")
+
+            def input_args(duration):
+                return ['-i', url]
+
+            def source_duration():
+                if clip_end is not None:
+                    return clip_end - clip_start
+                return _probe_duration(url) - clip_start
+
+            def source_size():
+                return _probe_size(url)
+        elif asset_type in ('image', 'text'):
+            if asset_type == 'text':
+                url = TEXT_SPRITE_CACHE.get_sprite_path(asset['parameters'])
+            else:
+                url = asset['parameters']['url']
+
+            def input_args(duration):
+                return ['-loop', '1', '-framerate', str(RENDER_FPS),
+                        '-t', _num((end if end is not None else duration) - start), '-i', url]
+
+            def source_size():
+                return _probe_size(url)
+            source_duration = None
+        else:
+            raise ValueError(f'Invalid asset type: {asset_type}')
+
+        filters.append('format=rgba')
+        filters += _visual_filters(actions)
+        filters.append(f"setpts=PTS-STARTPTS+{_num(start)}/TB")
+        position = ('0', '0')
+        for action in actions:
+            if action['type'] == 'screen_position':
+                position = _position_expressions(action['param'])
+        return {
+            'input': input_args,
+            'filters': filters,
+            'start': start,
+            'end': end,
+            'position': position,
+            'has_audio': has_audio,
+            'source_duration': source_duration,
+            'size': lambda: _layer_size(source_size(), actions),
+        }
+
+    def _compile_audio_layer(self, asset: Dict[str, Any]) -> Dict[str, Any]:
+        if asset['type'] != 'audio':
+            raise ValueError(f"Invalid asset type: {asset['type']}")
+        url = asset['parameters']['url']
+        actions = asset['actions']
+        start, end, subclip = _get_timing(actions)
+        filters = [f"aresample={AUDIO_SAMPLE_RATE}", "aformat=sample_fmts=fltp:channel_layouts=stereo"]
+        duration = None
+        if subclip:
+            clip_start = subclip.get('start_time', 0)
+            trim = f"atrim=start={_num(clip_start)}"
+            if subclip.get('end_time') is not None:
+                trim += f":end={_num(subclip['end_time'])}"
+                duration = subclip['end_time'] - clip_start
+            filters.append(trim + ",asetpts=PTS-STARTPTS")
+        for action in actions:
+            if action['type'] in UNSUPPORTED_ACTIONS:
+                raise UnsupportedEditingAction(f"Action '{action['type']}' is not supported by the ffmpeg backend")
+            if action['type'] == 'loop_background_music':
+                target_duration = action['param']
+                if isinstance(target_duration, dict):
+                    target_duration = target_duration.get('duration')
+                source_duration = duration if duration is not None else _probe_duration(url)
+                loop_start = source_duration * 0.15
+                loop_samples = int((source_duration - loop_start) * AUDIO_SAMPLE_RATE)
+                filters.append(f"atrim=start={_num(loop_start)},asetpts=N/SR/TB,"
+                               f"aloop=loop=-1:size={loop_samples},atrim=duration={_num(target_duration)},asetpts=N/SR/TB")
+                duration = target_duration
+            elif action['type'] == 'volume_percentage':
+                filters.append(f"volume={_num(action['param'])}")
+        if end is not None:
+            filters.append(f"atrim=duration={_num(end - start)}")
+            duration = end - start
+        if start:
+            filters.append(f"adelay=delays={int(start * 1000)}:all=1")
+        return {
+            'url': url,
+            'filters': filters,
+            'start': start,
+            'duration': duration,
+        }
+
+    def _get_total_duration(self, visual_layers, audio_layers) -> float:
+        '''Same rule as CoreEditingEngine: the audio duration wins, otherwise the end of the last visual layer'''
+        if audio_layers:
+            ends = []
+            for layer in audio_layers:
+                duration = layer['duration'] if layer['duration'] is not None else _probe_duration(layer['url'])
+                ends.append(layer['start'] + duration)
+            return max(ends)
+        ends = []
+        for layer in visual_layers:
+            if layer['end'] is not None:
+                ends.append(layer['end'])
+            elif layer['source_duration'] is not None:
+                ends.append(layer['start'] + layer['source_duration']())
+        if not ends:
+            raise UnsupportedEditingAction("Could not determine the duration of the video to render")
+        return max(ends)
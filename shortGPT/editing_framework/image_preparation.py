@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from shortGPT.editing_framework.layer_sizing import auto_resize_size, resize_size
+
+PREPARED_IMAGES_DIR = ".editing_assets/prepared_images/"
+# Actions applied once to the prepared file instead of to every frame
+FOLDED_ACTIONS = {'normalize_image', 'resize', 'auto_resize_image'}
+# Actions after which a resize no longer applies to the source image
+GEOMETRY_ACTIONS = {'crop', 'green_screen'}
+
+
+def _to_rgb(image: Image.Image) -> Image.Image:
+    '''Converts any image mode to RGB, or RGBA when the image has transparency'''
+    if image.mode in ('I', 'I;16', 'I;16B', 'I;16L', 'F'):
+        # High bit depth greyscale, brought to 8 bits in one vectorized pass
+        frame = np.asarray(image, dtype=np.float32)
+        scale = 257.0 if frame.max() > 255 else 1.0
+        image = Image.fromarray(np.clip(frame / scale, 0, 255).astype(np.uint8), mode='L')
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _fold_actions(size: Tuple[int, int], actions: List[Dict[str, Any]]) -> Tuple[Tuple[int, int], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    '''Returns the final size of the image, the folded actions and the actions left to the editing engine'''
+    folded, remaining = [], []
+    folding = True
+    for action in actions:
+        if action['type'] in GEOMETRY_ACTIONS:
+            folding = False
+        if not folding or action['type'] not in FOLDED_ACTIONS:
+            remaining.append(action)
+            continue
+        folded.append(action)
+        if action['type'] == 'resize':
+            size = resize_size(action['param'], size)
+        elif action['type'] == 'auto_resize_image':
+            size = auto_resize_size(action['param'], size)
+    return size, folded, remaining
+
+
+def prepare_image(url, actions: List[Dict[str, Any]], output_dir=PREPARED_IMAGES_DIR) -> Tuple[str, List[Dict[str, Any]]]:
+    '''
+    Writes the image converted to RGB(A) at its final on-screen size, once, so the editing engine doesn't resize
+    or normalize it on every frame. Returns the prepared file and the actions that still have to be applied.
+    Prepared files are named after the source file and the folded actions, and reused by later renders.
+    '''
+    with Image.open(url) as source:
+        source_size = source.size
+        size, folded, remaining = _fold_actions(source_size, actions)
+        if not folded:
+            return url, actions
+        stat = os.stat(url)
+        description = json.dumps({'source': [os.path.abspath(url), stat.st_size, stat.st_mtime_ns], 'actions': folded},
+                                 sort_keys=True, default=str)
+        prepared_file = os.path.join(output_dir, hashlib.sha256(description.encode('utf-8')).hexdigest() + ".png")
+        if os.path.exists(prepared_file):
+            return prepared_file, remaining
+        image = _to_rgb(source)
+    size = (max(int(size[0]), 1), max(int(size[1]), 1))
+    if size != image.size:
+        image = image.resize(size, Image.LANCZOS)
+    os.makedirs(output_dir, exist_ok=True)
+    temp_file = f"{prepared_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+    image.save(temp_file, format='PNG', compress_level=1)
+    os.replace(temp_file, prepared_file)
+    return prepared_file, remaining
+
+
+def prepare_image_assets(schema: Dict[str, Any], output_dir=PREPARED_IMAGES_DIR) -> Dict[str, Any]:
+    '''Points every local image asset of the schema to its prepared file. Images that can't be prepared are left as they are'''
+    for asset_key, asset in schema.get('visual_assets', {}).items():
+        if asset['type'] != 'image':
+            continue
+        url = asset['parameters'].get('url')
+        if not isinstance(url, str) or not os.path.isfile(url):
+            continue
+        try:
+            asset['parameters']['url'], asset['actions'] = prepare_image(url, asset.get('actions', []), output_dir)
+        except Exception as e:
+            print(f"Failed to prepare image {url}, it will be processed while rendering. Error : {str(e)}")
+    return schema
@@ -0,0 +1,23 @@
+from typing import Any, Dict, Tuple
+
+
+def resize_size(param: Dict[str, Any], size: Tuple[int, int]) -> Tuple[int, int]:
+    '''Size of a layer after a resize action, from its new_size (ratio or size), width and/or height'''
+    new_size, width, height = param.get('new_size'), param.get('width'), param.get('height')
+    w, h = size
+    if new_size is not None:
+        if isinstance(new_size, (int, float)):
+            return int(w * new_size), int(h * new_size)
+        return int(new_size[0]), int(new_size[1])
+    if width is not None and height is not None:
+        return int(width), int(height)
+    if height is not None:
+        return int(w * height / h), int(height)
+    return int(width), int(h * width / w)
+
+
+def auto_resize_size(param: Dict[str, Any], size: Tuple[int, int]) -> Tuple[int, int]:
+    '''Size of a layer after an auto_resize_image action, same rule as CoreEditingEngine'''
+    ar = size[0] / size[1]
+    max_width, max_height = param['maxWidth'], param['maxHeight']
+    return (int(max_height * ar), int(max_height)) if ar < 1 else (int(max_width), int(max_width / ar))
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from shortGPT.audio.audio_duration import get_duration_ffprobe
+from shortGPT.utils.file_utils import link_or_copy
+
+RENDER_CACHE_DIR = ".editing_assets/render_cache/"
+RENDER_CACHE_MAX_BYTES = int(os.getenv('RENDER_CACHE_MAX_BYTES', 5 * 1024 * 1024 * 1024))
+RENDER_CACHE_MAX_ENTRIES = int(os.getenv('RENDER_CACHE_MAX_ENTRIES', 200))
+# Renders are looked up in the cache only when it is enabled, or when renderVideo is called with use_cache=True
+RENDER_CACHE_ENABLED = os.getenv('RENDER_CACHE_ENABLED', '').lower() in ('1', 'true', 'yes')
+
+
+class RenderCache:
+    '''
+    Cache of rendered videos keyed on the editing schema.
+    The key hashes the normalized schema together with the content of every local file it references,
+    so an identical edit under another content id (retries, duplicate jobs) reuses the earlier render.
+    Entries are evicted least recently used first, by total size and by number of entries.
+    '''
+
+    def __init__(self, cache_dir=RENDER_CACHE_DIR, max_size_bytes=RENDER_CACHE_MAX_BYTES, max_entries=RENDER_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._file_hashes = {}
+        self._lock = threading.Lock()
+
+    def get_key(self, schema: Dict[str, Any]) -> str:
+        # Local files are replaced by the hash of their content, so the paths (which contain the content id)
+        # don't change the key and the same edit made by another job hits the cache
+        normalized = {}
+        for asset_group, assets in schema.items():
+            if asset_group not in ('visual_assets', 'audio_assets'):
+                normalized[asset_group] = assets
+                continue
+            normalized[asset_group] = {}
+            for asset_key, asset in assets.items():
+                parameters = {}
+                for param_name, value in asset.get('parameters', {}).items():
+                    if isinstance(value, str) and os.path.isfile(value):
+                        value = {'file_sha256': self._hash_file(value)}
+                    parameters[param_name] = value
+                normalized[asset_group][asset_key] = {**asset, 'parameters': parameters}
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def get(self, schema: Dict[str, Any], output_file) -> Optional[str]:
+        '''Places a previously rendered video of this schema at output_file. Returns None on a cache miss'''
+        cached_file = self._get_cached_file(self.get_key(schema))
+        if not os.path.exists(cached_file) or not self._is_valid(cached_file):
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(cached_file)
+        link_or_copy(cached_file, output_file)
+        with self._lock:
+            self.hits += 1
+        return output_file
+
+    def put(self, schema: Dict[str, Any], output_file):
+        '''Stores a freshly rendered video of this schema'''
+        if not os.path.exists(output_file):
+            return
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        cached_file = self._get_cached_file(self.get_key(schema))
+        temp_file = f"{cached_file}.{os.getpid()}.tmp"
+        link_or_copy(output_file, temp_file)
+        os.replace(temp_file, cached_file)
+        self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def _is_valid(self, cached_file) -> bool:
+        '''Drops entries that are empty or unreadable, left by an interrupted copy or a failed render'''
+        duration, _ = get_duration_ffprobe(cached_file) if os.path.getsize(cached_file) > 0 else (None, "")
+        if duration:
+            return True
+        print(f"Render cache entry {cached_file} is not a valid video, removing it")
+        try:
+            os.remove(cached_file)
+        except FileNotFoundError:
+            pass
+        return False
+
+    def _get_cached_file(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def _hash_file(self, path) -> str:
+        stat = os.stat(path)
+        signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if signature in self._file_hashes:
+                return self._file_hashes[signature]
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        with self._lock:
+            self._file_hashes[signature] = sha.hexdigest()
+        return sha.hexdigest()
+
+    def _evict(self):
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.mp4'):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        while entries and (total_size > self.max_size_bytes or len(entries) > self.max_entries):
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+RENDER_CACHE = RenderCache()
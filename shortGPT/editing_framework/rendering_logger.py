@@ -22,3 +22,30 @@ class MoviepyProgressLogger(ProgressBarLogger):
     def format_time(self, seconds):
         minutes, seconds = divmod(seconds, 60)
         return f'{int(minutes)}m {int(seconds)}s'
+
+
+class FFmpegProgressLogger:
+
+    def __init__(self, total_frames, callBackFunction = None):
+        self.total_frames = max(int(total_frames), 1)
+        self.callBackFunction = callBackFunction
+        self.start_time = time.time()
+
+    def progress_callback(self, line):
+        # ffmpeg -progress writes key=value lines, we only report on frame counts
+        key, _, value = line.strip().partition('=')
+        if key != 'frame' or not value.isdigit():
+            return
+        frame = min(int(value), self.total_frames)
+        percentage = (frame / self.total_frames) * 100
+        elapsed_time = time.time() - self.start_time
+        estimated_time = (elapsed_time / percentage) * (100 - percentage) if percentage != 0 else 0
+        progress_string = f'Rendering progress : {frame}/{self.total_frames} | Time spent: {self.format_time(elapsed_time)} | Time left: {self.format_time(estimated_time)}'
+        if (self.callBackFunction):
+            self.callBackFunction(progress_string)
+        else:
+            print(progress_string)
+
+    def format_time(self, seconds):
+        minutes, seconds = divmod(seconds, 60)
+        return f'{int(minutes)}m {int(seconds)}s'
@@ -0,0 +1,80 @@
+from typing import List, Tuple
+
+import numpy as np
+from moviepy import CompositeVideoClip, ImageClip
+from moviepy.Clip import Clip
+
+
+def precomposite_static_layers(clips: List[Clip], is_static: List[bool], size: Tuple[int, int]) -> List[Clip]:
+    """Flattens stacks of static layers so CompositeVideoClip blits them once per frame instead of once per layer.
+    Args:
+        clips (list): The visual clips, sorted by z.
+        is_static (list): Whether each clip shows the same frame for its whole lifetime (images, text).
+        size (tuple): The size of the composition.
+    Returns:
+        list: The clips to composite, where each run of adjacent static layers is replaced by one
+        pre-flattened image per interval of time during which its set of visible layers doesn't change.
+    """
+    result = []
+    run = []
+    for clip, static in zip(clips, is_static):
+        if static:
+            run.append(clip)
+            continue
+        result += _flatten_run(run, size)
+        run = []
+        result.append(clip)
+    result += _flatten_run(run, size)
+    return result
+
+
+def _get_intervals(run: List[Clip]):
+    '''Returns [start, end, active_layer_indexes] intervals, end is None for the open-ended last interval'''
+    breakpoints = sorted({clip.start for clip in run} | {clip.end for clip in run if clip.end is not None})
+    intervals = []
+    for t0, t1 in zip(breakpoints, breakpoints[1:] + [None]):
+        active = tuple(i for i, clip in enumerate(run) if clip.start <= t0 and (clip.end is None or clip.end > t0))
+        if intervals and intervals[-1][2] == active:
+            intervals[-1][1] = t1
+        else:
+            intervals.append([t0, t1, active])
+    return intervals
+
+
+def _flatten_run(run: List[Clip], size: Tuple[int, int]) -> List[Clip]:
+    if len(run) < 2:
+        return run
+    flattened = []
+    frames = {}
+    for t0, t1, active in _get_intervals(run):
+        if not active:
+            continue
+        if len(active) == 1:
+            clip = run[active[0]].with_start(t0)
+        else:
+            if active not in frames:
+                frames[active] = _flatten_clips([run[i] for i in active], size)
+            if frames[active] is None:
+                continue
+            image, alpha, position = frames[active]
+            clip = ImageClip(image).with_mask(ImageClip(alpha, is_mask=True)).with_position(position).with_start(t0)
+        if t1 is not None:
+            clip = clip.with_end(t1)
+        flattened.append(clip)
+    return flattened
+
+
+def _flatten_clips(clips: List[Clip], size: Tuple[int, int]):
+    '''Composites static clips once, returns the (rgb, alpha, position) of the visible bounding box'''
+    composite = CompositeVideoClip([clip.with_start(0) for clip in clips], size=size)
+    frame = composite.get_frame(0).astype('float64')
+    alpha = composite.mask.get_frame(0)
+    ys, xs = np.nonzero(alpha > 0)
+    if not len(xs):
+        return None
+    y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+    frame, alpha = frame[y0:y1, x0:x1], alpha[y0:y1, x0:x1]
+    # The composite is blended over black, un-premultiply it so it blends exactly over the real background
+    visible = alpha > 0
+    frame[visible] /= alpha[visible][:, None]
+    return np.clip(frame, 0, 255).astype('uint8'), alpha, (int(x0), int(y0))
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict
+
+import numpy as np
+from moviepy import TextClip
+from PIL import Image
+
+TEXT_SPRITE_CACHE_DIR = ".editing_assets/text_sprites/"
+
+
+def get_text_clip_info(text_clip_params: Dict[str, Any]) -> Dict[str, Any]:
+    '''Returns the TextClip keyword arguments for the parameters of a text asset'''
+    if not (any(key in text_clip_params for key in ['text','fontsize', 'size'])):
+        raise Exception('You must include at least a size or a fontsize to determine the size of your text')
+    text_method = text_clip_params.get('method', 'label')
+    clip_info = {
+        'text': text_clip_params['text'],
+        'font': text_clip_params.get('font'),
+        'font_size': text_clip_params.get('font_size'),
+        'color': text_clip_params.get('color'),
+        'stroke_width': text_clip_params.get('stroke_width'),
+        'stroke_color': text_clip_params.get('stroke_color'),
+        'size': text_clip_params.get('size'),
+        'method': text_method,
+        'text_align': text_clip_params.get('text_align', 'center')
+    }
+    return {k: v for k, v in clip_info.items() if v is not None}
+
+
+def rasterize_text(clip_info: Dict[str, Any]) -> np.ndarray:
+    '''Renders a TextClip once and returns it as an RGBA uint8 array'''
+    clip = TextClip(**clip_info)
+    frame = clip.get_frame(0)
+    if clip.mask is not None:
+        alpha = clip.mask.get_frame(0) * 255
+    else:
+        alpha = np.full(frame.shape[:2], 255)
+    return np.dstack([frame, alpha]).astype('uint8')
+
+
+class TextSpriteCache:
+    '''
+    Caches rasterized text assets as RGBA sprites, in memory and as PNG files on disk.
+    Sprites are keyed on every TextClip parameter, so repeated captions are rasterized once across renders.
+    Both levels are evicted least recently used first.
+    '''
+
+    def __init__(self, cache_dir=TEXT_SPRITE_CACHE_DIR, max_memory_sprites=256, max_disk_bytes=200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_sprites = max_memory_sprites
+        self.max_disk_bytes = max_disk_bytes
+        self.memory_cache = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get_key(self, clip_info: Dict[str, Any]) -> str:
+        return hashlib.sha256(json.dumps(clip_info, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get_sprite(self, text_clip_params: Dict[str, Any]) -> np.ndarray:
+        '''Returns the RGBA sprite of a text asset, rasterizing it only on a cache miss'''
+        clip_info = get_text_clip_info(text_clip_params)
+        key = self.get_key(clip_info)
+        with self._lock:
+            if key in self.memory_cache:
+                self.memory_cache.move_to_end(key)
+                self.hits += 1
+                return self.memory_cache[key]
+        sprite_path = self._get_sprite_file(key)
+        if os.path.exists(sprite_path):
+            sprite = np.array(Image.open(sprite_path).convert('RGBA'))
+            os.utime(sprite_path)
+            with self._lock:
+                self.disk_hits += 1
+        else:
+            sprite = rasterize_text(clip_info)
+            self._write_sprite(sprite, sprite_path)
+            with self._lock:
+                self.misses += 1
+        self._remember(key, sprite)
+        return sprite
+
+    def get_sprite_path(self, text_clip_params: Dict[str, Any]) -> str:
+        '''Returns the path of the PNG sprite of a text asset, rasterizing it only on a cache miss'''
+        sprite_path = self._get_sprite_file(self.get_key(get_text_clip_info(text_clip_params)))
+        if not os.path.exists(sprite_path):
+            self.get_sprite(text_clip_params)
+        else:
+            os.utime(sprite_path)
+            with self._lock:
+                self.disk_hits += 1
+        return sprite_path
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'disk_hits': self.disk_hits, 'misses': self.misses}
+
+    def clear(self):
+        with self._lock:
+            self.memory_cache.clear()
+        if os.path.exists(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, filename))
+
+    def _get_sprite_file(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def _remember(self, key: str, sprite: np.ndarray):
+        with self._lock:
+            self.memory_cache[key] = sprite
+            self.memory_cache.move_to_end(key)
+            while len(self.memory_cache) > self.max_memory_sprites:
+                self.memory_cache.popitem(last=False)
+
+    def _write_sprite(self, sprite: np.ndarray, sprite_path: str):
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        # Write then rename, so concurrent renders never read a partial sprite
+        temp_path = f"{sprite_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        Image.fromarray(sprite, 'RGBA').save(temp_path, format='PNG')
+        os.replace(temp_path, sprite_path)
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith('.png'):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+TEXT_SPRITE_CACHE = TextSpriteCache()
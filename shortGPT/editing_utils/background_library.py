@@ -0,0 +1,167 @@
+import argparse
+import bisect
+import json
+import os
+import random
+import re
+import subprocess
+import threading
+from typing import Any, Dict, List, Optional
+
+from shortGPT.audio.audio_duration import get_duration_ffprobe
+from shortGPT.config.asset_db import AssetDatabase, AssetType
+from shortGPT.editing_framework.core_editing_engine import RENDER_FPS
+from shortGPT.editing_utils.handle_videos import SHORT_CROP_FILTER
+
+BACKGROUND_LIBRARY_DIR = ".editing_assets/background_library/"
+# One keyframe per second, so stream copied clips start at most a second away from the random start
+MEZZANINE_GOP_SECONDS = 1
+
+
+def _slugify(name: str) -> str:
+    return re.sub(r'[^\w\-]+', '_', name).strip('_') or 'background'
+
+
+def probe_keyframes(video_file) -> List[float]:
+    '''Returns the timestamps of the keyframes of the first video stream'''
+    command = ['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags',
+               '-of', 'csv=print_section=0', video_file]
+    output = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True).stdout
+    keyframes = []
+    for line in output.splitlines():
+        parts = line.split(',')
+        if len(parts) >= 2 and 'K' in parts[1] and parts[0] not in ('', 'N/A'):
+            keyframes.append(float(parts[0]))
+    return sorted(keyframes)
+
+
+class BackgroundLibrary:
+    '''
+    Local copies of the "background video" assets, transcoded once to the short format (1080x1920, render fps,
+    a keyframe every MEZZANINE_GOP_SECONDS) with a keyframe index stored next to each file.
+    Random background clips are then cut from them with stream copy, without network access or re-encoding.
+    '''
+
+    def __init__(self, library_dir=BACKGROUND_LIBRARY_DIR):
+        self.library_dir = library_dir
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        '''Returns the index of a prepared background video, None if it wasn't prepared'''
+        index_file = self._get_index_file(name)
+        if not os.path.exists(index_file):
+            return None
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if not os.path.exists(index['path']):
+            return None
+        return index
+
+    def prepare(self, name: str, source_url: str = None, force=False) -> Dict[str, Any]:
+        '''Transcodes a background video asset into the library and indexes its keyframes'''
+        index = self.get(name)
+        if index and not force:
+            return index
+        source_url = source_url or AssetDatabase.get_asset_link(name)
+        if not os.path.exists(self.library_dir):
+            os.makedirs(self.library_dir, exist_ok=True)
+        output_file = os.path.join(self.library_dir, f"{_slugify(name)}.mp4")
+        temp_file = f"{output_file}.{os.getpid()}.tmp.mp4"
+        gop = RENDER_FPS * MEZZANINE_GOP_SECONDS
+        print(f"Preparing background video '{name}' for the background library")
+        command = [
+            'ffmpeg', '-loglevel', 'error', '-y',
+            '-i', source_url,
+            '-vf', f"{SHORT_CROP_FILTER},fps={RENDER_FPS}",
+            '-an',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', '20', '-pix_fmt', 'yuv420p',
+            '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0',
+            '-movflags', '+faststart',
+            temp_file
+        ]
+        try:
+            subprocess.run(command, check=True)
+            os.replace(temp_file, output_file)
+        finally:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+        keyframes = probe_keyframes(output_file)
+        if not keyframes:
+            raise Exception(f"No keyframes found in the prepared background video {output_file}")
+        duration, _ = get_duration_ffprobe(output_file)
+        index = {
+            'name': name,
+            'path': output_file,
+            'duration': duration,
+            'fps': RENDER_FPS,
+            'width': 1080,
+            'height': 1920,
+            'keyframes': keyframes,
+        }
+        index_file = self._get_index_file(name)
+        with self._lock:
+            with open(f"{index_file}.tmp", 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(f"{index_file}.tmp", index_file)
+        return index
+
+    def prepare_all(self, force=False) -> List[str]:
+        '''Prepares every background video asset of the AssetDatabase, returns their names'''
+        names = AssetDatabase.get_asset_names(AssetType.BACKGROUND_VIDEO)
+        for name in names:
+            try:
+                self.prepare(name, force=force)
+            except Exception as e:
+                print(f"Failed preparing background video '{name}': {e}")
+        return names
+
+    def extract_random_clip(self, name: str, clip_duration, output_file) -> Optional[str]:
+        """Cuts a random clip of a prepared background video with stream copy, starting on a keyframe.
+        Args:
+            name (str): Name of the background video asset.
+            clip_duration (float): The duration of the clip in seconds.
+            output_file (str): The output file path for the extracted clip.
+        Returns:
+            str: The output file, or None if the video isn't in the library.
+        """
+        index = self.get(name)
+        if index is None:
+            return None
+        video_duration = index['duration']
+        if not video_duration*0.7 > 120:
+            raise Exception("Video too short")
+        # Same window as extract_random_clip_from_video, snapped to the keyframe before the random start
+        start_time = video_duration*0.15 + random.random() * (0.7*video_duration-clip_duration)
+        keyframes = index['keyframes']
+        start_time = keyframes[max(bisect.bisect_right(keyframes, start_time) - 1, 0)]
+        command = [
+            'ffmpeg', '-loglevel', 'error', '-y',
+            '-ss', str(start_time),
+            '-i', index['path'],
+            '-t', str(clip_duration),
+            '-c', 'copy',
+            '-avoid_negative_ts', 'make_zero',
+            output_file
+        ]
+        subprocess.run(command, check=True)
+        if not os.path.exists(output_file):
+            raise Exception("Random clip failed to be written")
+        return output_file
+
+    def _get_index_file(self, name: str) -> str:
+        return os.path.join(self.library_dir, f"{_slugify(name)}.json")
+
+
+BACKGROUND_LIBRARY = BackgroundLibrary()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcode the background video assets into the local background library")
+    parser.add_argument("names", nargs="*", help="Background video assets to prepare (default: all of them)")
+    parser.add_argument("--force", action="store_true", help="Transcode again videos that are already prepared")
+    args = parser.parse_args()
+    if args.names:
+        for asset_name in args.names:
+            BACKGROUND_LIBRARY.prepare(asset_name, force=args.force)
+    else:
+        BACKGROUND_LIBRARY.prepare_all(force=args.force)
@@ -1,20 +1,89 @@
-from shortGPT.api_utils.image_api import getBingImages
+import hashlib
+import os
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
 from tqdm import tqdm
-import random
-import math
 
-def getImageUrlsTimed(imageTextPairs):
-    results = []
-    for pair in tqdm(imageTextPairs, desc='Search engine queries for images...'):
-        timing, query = pair
+from shortGPT.api_utils.image_api import get_session, getBingImages
+from shortGPT.editing_utils.image_cache import IMAGE_SEARCH_CACHE, IMAGE_STORE
+
+IMAGE_SEARCH_WORKERS = int(os.getenv('IMAGE_SEARCH_WORKERS', 4))
+IMAGE_DOWNLOAD_WORKERS = int(os.getenv('IMAGE_DOWNLOAD_WORKERS', 8))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif')
+
+
+def getImageUrlsTimed(imageTextPairs, max_workers=IMAGE_SEARCH_WORKERS):
+    image_urls = searchImageUrlsFromQueries([query for _, query in imageTextPairs], max_workers=max_workers)
+    return [(timing, image_urls[query]) for timing, query in imageTextPairs]
+
+
+def searchImageUrlsFromQueries(queries, max_workers=IMAGE_SEARCH_WORKERS):
+    """Searches an image for each distinct query concurrently. Returns {query: url or None}"""
+    unique_queries = list(dict.fromkeys(queries))
+
+    def search(query):
         image_url = searchImageUrlsFromQuery(query)
         # Retry with alternative query if image_url is None
         if not image_url:
             alt_query = query.replace(' image', '').replace('person', 'object')
-            image_url = searchImageUrlsFromQuery(alt_query)
-        results.append((timing, image_url))
-    return results
+            if alt_query != query:
+                image_url = searchImageUrlsFromQuery(alt_query)
+        return image_url
+
+    if not unique_queries:
+        return {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        image_urls = list(tqdm(executor.map(search, unique_queries), total=len(unique_queries),
+                               desc='Search engine queries for images...'))
+    return dict(zip(unique_queries, image_urls))
+
+
+def downloadImages(urls, output_dir, max_workers=IMAGE_DOWNLOAD_WORKERS):
+    """Downloads each distinct image url concurrently into output_dir. Returns {url: local path or None}.
+    Local paths are returned as they are, and files already downloaded by a previous run are reused."""
+    unique_urls = list(dict.fromkeys(url for url in urls if url))
+    if not unique_urls:
+        return {}
+    os.makedirs(output_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        paths = list(executor.map(lambda url: downloadImage(url, output_dir), unique_urls))
+    return dict(zip(unique_urls, paths))
+
 
+def downloadImage(url, output_dir):
+    """Downloads an image into output_dir, named after its url. Returns the local path, or None if it isn't a valid image"""
+    if os.path.isfile(url):
+        return url
+    extension = os.path.splitext(urllib.parse.urlparse(url).path)[1].lower()
+    if extension not in IMAGE_EXTENSIONS:
+        extension = '.jpg'
+    output_file = os.path.join(output_dir, "image_" + hashlib.sha256(url.encode('utf-8')).hexdigest()[:16] + extension)
+    if os.path.exists(output_file):
+        return output_file
+    if IMAGE_STORE.get(url, output_file):
+        return output_file
+    temp_file = output_file + ".tmp" + extension
+    try:
+        response = get_session().get(url, timeout=30)
+        if response.status_code != 200 or not response.headers.get('Content-Type', 'image/').startswith('image/'):
+            print(f"[WARNING] Could not download image {url} ({response.status_code})")
+            return None
+        with open(temp_file, 'wb') as f:
+            f.write(response.content)
+        # Error pages served as images would only fail later, while rendering
+        with Image.open(temp_file) as image:
+            image.verify()
+        IMAGE_STORE.put(url, temp_file)
+        os.replace(temp_file, output_file)
+        return output_file
+    except Exception as e:
+        print(f"[WARNING] Could not download image {url}: {str(e)}")
+        return None
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
 
 
 def searchImageUrlsFromQuery(query, top=3, expected_dim=[720,720], retries=5):
@@ -22,42 +91,46 @@ def searchImageUrlsFromQuery(query, top=3, expected_dim=[720,720], retries=5):
     # Add car-specific handling
     if "genesis" in query.lower() and "hyundai" not in query.lower():
         query = f"Hyundai {query}"
-    
+
     # Add more context for better image search
     if query.lower() in ["warranty", "years", "miles"]:
         query = f"Hyundai warranty badge"
-    
+
     # For specific numeric values like "10 years"
     if any(str(num) in query for num in range(10, 101)) and len(query.split()) <= 2:
         query = f"Hyundai warranty {query}"
-    
+
     print(f"[INFO] Searching for image: '{query}'")
-    
+
     # Retry loop for better robustness
     for attempt in range(retries):
         try:
-            from shortGPT.api_utils.image_api import getBingImages
-            images = getBingImages(query, count=top)
+            # Queries searched before, simplified ones included, are answered without going to the network
+            images = IMAGE_SEARCH_CACHE.get(query)
+            if images is None:
+                images = getBingImages(query)
+                IMAGE_SEARCH_CACHE.put(query, images)
+            images = images[:top]
             if images and len(images) > 0:
                 # Sort by aspect ratio to find best match
                 min_diff = float('inf')
                 best_image = None
-                
+
                 for img in images:
                     width = img['width']
                     height = img['height']
                     if width == 0 or height == 0:
                         continue
-                        
+
                     diff = abs(width/height - expected_dim[0]/expected_dim[1])
                     if diff < min_diff:
                         min_diff = diff
                         best_image = img
-                
+
                 if best_image:
                     print(f"[SUCCESS] Found image for '{query}'")
                     return best_image['url']
-            
+
             # If we get here, we didn't find a good image
             if attempt < retries - 1:
                 # Try with simpler query on next attempt
@@ -65,11 +138,11 @@ def searchImageUrlsFromQuery(query, top=3, expected_dim=[720,720], retries=5):
                     terms = query.split()
                     query = " ".join(terms[:2])  # Keep only first two terms
                     print(f"[INFO] Retrying with simplified query: '{query}'")
-                    
+
         except Exception as e:
             print(f"[ERROR] Image search failed: {str(e)}")
             if attempt < retries - 1:
                 print(f"[INFO] Retrying... (attempt {attempt+2}/{retries})")
-    
+
     print(f"[WARNING] Could not find suitable image for '{query}' after {retries} attempts")
-    return None
\ No newline at end of file
+    return None
@@ -3,6 +3,7 @@ import random
 import yt_dlp
 import subprocess
 import json
+from concurrent.futures import ThreadPoolExecutor
 
 def getYoutubeVideoLink(url):
     format_filter = "[height<=1920]" if 'shorts' in url else "[height<=1080]"
@@ -24,7 +25,11 @@ def getYoutubeVideoLink(url):
     except Exception as e:
         raise Exception(f"Failed getting video link from the following video/url {url} {e.args[0]}")
 
-def extract_random_clip_from_video(video_url, video_duration, clip_duration, output_file):
+# Same framing as the crop_1920x1080_to_short editing step (crop, resize to 1920, crop), as a single center crop
+SHORT_CROP_FILTER = "crop=trunc(ih*9/16):ih:(iw-trunc(ih*9/16))/2:0,scale=1080:1920,setsar=1"
+
+
+def extract_random_clip_from_video(video_url, video_duration, clip_duration, output_file, crop_to_short=False, fps=None):
     """Extracts a clip from a video using a signed URL.
     Args:
         video_url (str): The signed URL of the video.
@@ -32,6 +37,9 @@ def extract_random_clip_from_video(video_url, video_duration, clip_duration, out
         start_time (int): The start time of the clip in seconds.
         clip_duration (int): The duration of the clip in seconds.
         output_file (str): The output file path for the extracted clip.
+        crop_to_short (bool): Crops and scales the clip to 1080x1920 in the same ffmpeg pass, so it can be
+        added with EditingStep.ADD_BACKGROUND_SHORT instead of EditingStep.CROP_1920x1080.
+        fps (int): Frame rate of the extracted clip, the source frame rate when None.
     """
     if not video_duration:
         raise Exception("Could not get video duration")
@@ -45,6 +53,14 @@ def extract_random_clip_from_video(video_url, video_duration, clip_duration, out
         '-ss', str(start_time),
         '-t', str(clip_duration),
         '-i', video_url,
+    ]
+    filters = [SHORT_CROP_FILTER] if crop_to_short else []
+    if fps:
+        filters.append(f"fps={fps}")
+    if filters:
+        # The background video is used without its audio
+        command += ['-vf', ",".join(filters), '-an']
+    command += [
         '-c:v', 'libx264',
         '-preset', 'ultrafast',
         output_file
@@ -57,6 +73,71 @@ def extract_random_clip_from_video(video_url, video_duration, clip_duration, out
     return output_file
 
 
+# Simultaneous downloads and transcodes of prepare_stock_clips, each ffmpeg process is multithreaded
+STOCK_CLIP_WORKERS = int(os.getenv('STOCK_CLIP_WORKERS', 3))
+
+
+def prepare_stock_clip(video_url, clip_duration, output_file, size, fps):
+    """Fetches the first clip_duration seconds of a stock video and transcodes them to size and fps.
+    Only the part of the remote file that is needed is read, and the output has no audio.
+    Args:
+        video_url (str): The url (or path) of the video.
+        clip_duration (float): The duration of the segment showing the video.
+        output_file (str): The output file path, an mp4 file.
+        size (tuple): (width, height) of the output.
+        fps (int): Frame rate of the output.
+    """
+    if os.path.exists(output_file):
+        return output_file
+    temp_file = output_file[:-len(".mp4")] + ".tmp.mp4"
+    command = ['ffmpeg', '-y', '-loglevel', 'error']
+    if video_url.startswith('http'):
+        command += ['-reconnect', '1', '-reconnect_streamed', '1', '-reconnect_delay_max', '5']
+    width, height = size
+    command += [
+        '-t', str(clip_duration),
+        '-i', video_url,
+        '-vf', f"scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},setsar=1,fps={fps}",
+        '-an',
+        '-c:v', 'libx264',
+        '-preset', 'ultrafast',
+        '-crf', '18',
+        '-pix_fmt', 'yuv420p',
+        temp_file
+    ]
+    try:
+        subprocess.run(command, check=True)
+        if not os.path.exists(temp_file):
+            raise Exception("Stock clip failed to be written")
+        os.replace(temp_file, output_file)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+    return output_file
+
+
+def prepare_stock_clips(timed_video_urls, output_dir, size, fps, max_workers=STOCK_CLIP_WORKERS):
+    """Prepares the clip of every [[t1, t2], url] segment concurrently, trimmed to t2 - t1 seconds.
+    Returns:
+        list: [[t1, t2], path] segments. A segment whose clip couldn't be prepared keeps its url, and is streamed while rendering.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    def prepare(i):
+        (t1, t2), video_url = timed_video_urls[i]
+        if not video_url:
+            return video_url
+        try:
+            return prepare_stock_clip(video_url, t2 - t1, os.path.join(output_dir, f"clip_{i}.mp4"), size, fps)
+        except Exception as e:
+            print(f"Failed preparing the stock clip {video_url}, it will be streamed while rendering. Error : {str(e)}")
+            return video_url
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        paths = list(executor.map(prepare, range(len(timed_video_urls))))
+    return [[timing, path] for (timing, _), path in zip(timed_video_urls, paths)]
+
+
 def get_aspect_ratio(video_file):
     cmd = 'ffprobe -i "{}" -v quiet -print_format json -show_format -show_streams'.format(video_file)
 #     jsonstr = subprocess.getoutput(cmd)
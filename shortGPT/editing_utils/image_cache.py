@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from shortGPT.utils.file_utils import link_or_copy
+
+IMAGE_CACHE_DIR = ".editing_assets/image_cache/"
+# Seconds during which the results of an image search are reused
+IMAGE_SEARCH_CACHE_TTL = int(os.getenv('IMAGE_SEARCH_CACHE_TTL', 7 * 24 * 3600))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 1024 * 1024 * 1024))
+
+
+def _get_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ImageSearchCache:
+    '''
+    On-disk cache of image searches: the ranked candidates ({url, width, height}) returned for a query.
+    Subjects that come back across shorts are answered locally until their entry is older than ttl seconds.
+    '''
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR + "searches/", ttl=IMAGE_SEARCH_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, query: str) -> Optional[List[Dict[str, Any]]]:
+        try:
+            with open(self._get_cached_file(query), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if time.time() - entry['time'] > self.ttl:
+                raise ValueError("Expired image search")
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry['images']
+
+    def put(self, query: str, images: List[Dict[str, Any]]):
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        cached_file = self._get_cached_file(query)
+        temp_file = f"{cached_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({'query': query, 'time': time.time(), 'images': images}, f)
+        os.replace(temp_file, cached_file)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        if os.path.exists(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, filename))
+
+    def _get_cached_file(self, query: str) -> str:
+        return os.path.join(self.cache_dir, f"{_get_hash(query.strip().lower())}.json")
+
+
+class ImageStore:
+    '''
+    Content-addressed store of downloaded images. Each image is kept once, named after the sha256 of its bytes,
+    and small index files map the urls it was downloaded from to it, so the same picture found under several
+    urls is stored once. Images are evicted least recently used first once the store exceeds max_size_bytes.
+    '''
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR + "images/", max_size_bytes=IMAGE_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, url: str, output_file) -> Optional[str]:
+        '''Places the stored image of url at output_file. Returns None if it isn't stored'''
+        stored_file = None
+        try:
+            with open(self._get_index_file(url), 'r', encoding='utf-8') as f:
+                stored_file = os.path.join(self.cache_dir, f.read().strip())
+        except (FileNotFoundError, OSError):
+            pass
+        if not stored_file or not os.path.exists(stored_file):
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(stored_file)
+        link_or_copy(stored_file, output_file)
+        with self._lock:
+            self.hits += 1
+        return output_file
+
+    def put(self, url: str, image_file):
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir, exist_ok=True)
+        sha = hashlib.sha256()
+        with open(image_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        stored_name = sha.hexdigest() + os.path.splitext(image_file)[1].lower()
+        stored_file = os.path.join(self.cache_dir, stored_name)
+        suffix = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        if not os.path.exists(stored_file):
+            link_or_copy(image_file, f"{stored_file}.{suffix}")
+            os.replace(f"{stored_file}.{suffix}", stored_file)
+        index_file = self._get_index_file(url)
+        with open(f"{index_file}.{suffix}", 'w', encoding='utf-8') as f:
+            f.write(stored_name)
+        os.replace(f"{index_file}.{suffix}", index_file)
+        self._evict()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        if os.path.exists(self.cache_dir):
+            for filename in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, filename))
+
+    def _get_index_file(self, url: str) -> str:
+        return os.path.join(self.cache_dir, f"{_get_hash(url)}.url")
+
+    def _evict(self):
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith('.url') or filename.endswith('.tmp'):
+                continue
+            path = os.path.join(self.cache_dir, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        total_size = sum(size for _, size, _ in entries)
+        # Index files left pointing at an evicted image are read as misses
+        while entries and total_size > self.max_size_bytes:
+            _, size, path = entries.pop(0)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+IMAGE_SEARCH_CACHE = ImageSearchCache()
+IMAGE_STORE = ImageStore()
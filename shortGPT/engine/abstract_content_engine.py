@@ -5,8 +5,14 @@ from shortGPT.audio.voice_module import VoiceModule
 from shortGPT.config.languages import Language
 from shortGPT.config.path_utils import get_program_path
 from shortGPT.database.content_database import ContentDatabase
+from shortGPT.editing_framework.editing_engine import RenderBackend
+from shortGPT.gpt.llm_cache import LLM_RESPONSE_CACHE
 
 CONTENT_DB = ContentDatabase()
+# Backend rendering the videos of every engine: moviepy (default), moviepy_segmented or ffmpeg
+RENDER_BACKEND = os.getenv('RENDER_BACKEND', RenderBackend.MOVIEPY.value)
+# Number of chunks of a moviepy_segmented render, 0 for one per CPU core
+RENDER_SEGMENTS = int(os.getenv('RENDER_SEGMENTS', 0))
 
 
 class AbstractContentEngine(ABC):
@@ -17,6 +23,8 @@ class AbstractContentEngine(ABC):
             )
         else:
             self.dataManager = CONTENT_DB.createContentDataManager(content_type)
+        # _db_ writes are persisted together at the end of each step of makeContent
+        self.dataManager.set_write_behind(True)
         self.id = str(self.dataManager._getId())
         self.initializeFFMPEG()
         self.prepareEditingPaths()
@@ -25,6 +33,7 @@ class AbstractContentEngine(ABC):
         self.stepDict = {}
         self.default_logger = lambda _: None
         self.logger = self.default_logger
+        self.set_render_backend(RENDER_BACKEND, RENDER_SEGMENTS or None)
 
     def __getattr__(self, name):
         if name.startswith('_db_'):
@@ -61,18 +70,28 @@ class AbstractContentEngine(ABC):
         return self._db_ready_to_upload
 
     def makeContent(self):
-        while (not self.isShortDone()):
-            currentStep = self._db_last_completed_step + 1
-            if currentStep not in self.stepDict:
-                raise Exception(f'Incorrect step {currentStep}')
-            if self.stepDict[currentStep].__name__ == "_editAndRenderShort":
-                yield currentStep, f'Current step ({currentStep} / {self.get_total_steps()}) : ' + "Preparing rendering assets..."
-            else:
-                yield currentStep, f'Current step ({currentStep} / {self.get_total_steps()}) : ' + self.stepDict[currentStep].__name__
-            if self.logger is not self.default_logger:
-                print(f'Step {currentStep} {self.stepDict[currentStep].__name__}')
-            self.stepDict[currentStep]()
-            self._db_last_completed_step = currentStep
+        try:
+            while (not self.isShortDone()):
+                currentStep = self._db_last_completed_step + 1
+                if currentStep not in self.stepDict:
+                    raise Exception(f'Incorrect step {currentStep}')
+                if self.stepDict[currentStep].__name__ == "_editAndRenderShort":
+                    yield currentStep, f'Current step ({currentStep} / {self.get_total_steps()}) : ' + "Preparing rendering assets..."
+                else:
+                    yield currentStep, f'Current step ({currentStep} / {self.get_total_steps()}) : ' + self.stepDict[currentStep].__name__
+                if self.logger is not self.default_logger:
+                    print(f'Step {currentStep} {self.stepDict[currentStep].__name__}')
+                self.stepDict[currentStep]()
+                self._db_last_completed_step = currentStep
+                # The step's results and its completion are written in one update
+                self.dataManager.flush()
+        finally:
+            # Keep partial results of a failed step, without marking it completed
+            self.dataManager.flush()
+            self.logger(f"LLM response cache: {LLM_RESPONSE_CACHE.stats()}")
+
+    def flush(self):
+        self.dataManager.flush()
 
     def get_video_output_path(self):
         return self._db_video_path
@@ -83,6 +102,14 @@ class AbstractContentEngine(ABC):
     def set_logger(self, logger):
         self.logger = logger
 
+    def set_render_backend(self, backend, segments=None):
+        '''Sets the RenderBackend (or its name) and the number of segments used to render the video'''
+        try:
+            self.render_backend = RenderBackend(backend)
+        except ValueError:
+            raise Exception(f"Unknown render backend '{backend}', expected one of {[b.value for b in RenderBackend]}")
+        self.render_segments = segments
+
     def initializeFFMPEG(self):
         ffmpeg_path = get_program_path("ffmpeg")
         if not ffmpeg_path:
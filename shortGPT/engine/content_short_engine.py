@@ -4,14 +4,16 @@ import re
 import shutil
 from abc import abstractmethod
 
-from shortGPT.audio import audio_utils
+from shortGPT.audio import audio_pipeline, audio_utils
 from shortGPT.audio.audio_duration import get_asset_duration
 from shortGPT.audio.voice_module import VoiceModule
 from shortGPT.config.asset_db import AssetDatabase
 from shortGPT.config.languages import Language
+from shortGPT.editing_framework.core_editing_engine import RENDER_FPS
 from shortGPT.editing_framework.editing_engine import (EditingEngine,
                                                        EditingStep)
 from shortGPT.editing_utils import captions, editing_images
+from shortGPT.editing_utils.background_library import BACKGROUND_LIBRARY
 from shortGPT.editing_utils.handle_videos import extract_random_clip_from_video
 from shortGPT.engine.abstract_content_engine import AbstractContentEngine
 from shortGPT.gpt import gpt_editing, gpt_translate, gpt_yt
@@ -89,8 +91,9 @@ class ContentShortEngine(AbstractContentEngine):
         if (self._db_audio_path):
             return
         self.verifyParameters(tempAudioPath=self._db_temp_audio_path)
-        self._db_audio_path = audio_utils.speedUpAudio(
-            self._db_temp_audio_path, self.dynamicAssetDir+"audio_voice.wav")
+        # The duration of the voiceover follows from the tempo, it doesn't need to be probed again later
+        self._db_audio_path, self._db_voiceover_duration = audio_pipeline.process_audio(
+            self._db_temp_audio_path, self.dynamicAssetDir+"audio_voice.wav", max_duration=audio_pipeline.MAX_SHORT_DURATION)
 
     def _timeCaptions(self):
         self.verifyParameters(audioPath=self._db_audio_path)
@@ -110,13 +113,38 @@ class ContentShortEngine(AbstractContentEngine):
 
     def _generateImageUrls(self):
         if self._db_timed_image_searches:
-            self._db_timed_image_urls = editing_images.getImageUrlsTimed(
-                self._db_timed_image_searches)
+            # Every query, main topic included, is searched once and concurrently, nothing is searched at render time
+            queries = [query for _, query in self._db_timed_image_searches]
+            main_topic = getattr(self, 'facts_subject', None)
+            if main_topic:
+                queries.append(main_topic)
+            image_urls = editing_images.searchImageUrlsFromQueries(queries)
+            self._db_timed_image_urls = [(timing, image_urls[query]) for timing, query in self._db_timed_image_searches]
+            if main_topic:
+                self._db_main_topic_image_url = image_urls[main_topic]
+            self._downloadImages()
+
+    def _downloadImages(self):
+        """Downloads the images of the short into its asset directory, so rendering only reads local files"""
+        if self._db_timed_image_paths is not None or not self._db_timed_image_urls:
+            return
+        urls = [url for _, url in self._db_timed_image_urls]
+        if self._db_main_topic_image_url:
+            urls.append(self._db_main_topic_image_url)
+        image_paths = editing_images.downloadImages(urls, self.dynamicAssetDir + "images/")
+        self._db_timed_image_paths = [(timing, image_paths.get(url)) for timing, url in self._db_timed_image_urls]
+        if self._db_main_topic_image_url:
+            self._db_main_topic_image_path = image_paths.get(self._db_main_topic_image_url)
 
     def _chooseBackgroundMusic(self):
         self._db_background_music_url = AssetDatabase.get_asset_link(self._db_background_music_name)
 
     def _chooseBackgroundVideo(self):
+        prepared_background = BACKGROUND_LIBRARY.get(self._db_background_video_name)
+        if prepared_background:
+            self._db_background_video_url = prepared_background['path']
+            self._db_background_video_duration = prepared_background['duration']
+            return
         self._db_background_video_url = AssetDatabase.get_asset_link(
             self._db_background_video_name)
         self._db_background_video_duration = AssetDatabase.get_asset_duration(
@@ -131,13 +159,41 @@ class ContentShortEngine(AbstractContentEngine):
             self.logger("Rendering short: (1/4) preparing voice asset...")
             self._db_audio_path, self._db_voiceover_duration = get_asset_duration(
                 self._db_audio_path, isVideo=False)
+        if not self._db_mixed_audio_path:
+            self.logger("Rendering short: (2/4) mixing background music...")
+            self._db_mixed_audio_path, _ = audio_pipeline.mix_voiceover_and_music(
+                self._db_audio_path, self._db_background_music_url, self.dynamicAssetDir + "mixed_audio.wav",
+                voiceover_duration=self._db_voiceover_duration, music_volume=0.11)
         if not self._db_background_trimmed:
-            self.logger("Rendering short: (2/4) preparing background video asset...")
+            self.logger("Rendering short: (3/4) preparing background video asset...")
+            # Backgrounds prepared in the background library are cut locally without re-encoding
+            self._db_background_trimmed = BACKGROUND_LIBRARY.extract_random_clip(
+                self._db_background_video_name, self._db_voiceover_duration, self.dynamicAssetDir + "clipped_background.mp4")
+            if self._db_background_trimmed:
+                self._db_background_cropped = True
+                return
             self._db_background_trimmed = extract_random_clip_from_video(
-                self._db_background_video_url, self._db_background_video_duration, self._db_voiceover_duration, self.dynamicAssetDir + "clipped_background.mp4")
+                self._db_background_video_url, self._db_background_video_duration, self._db_voiceover_duration, self.dynamicAssetDir + "clipped_background.mp4",
+                crop_to_short=True, fps=RENDER_FPS)
+            self._db_background_cropped = True
+
+    def _addAudioSteps(self, videoEditor: EditingEngine, music_volume=0.11):
+        # The voiceover and the music are mixed by ffmpeg beforehand, jobs started before that still mix them while rendering
+        if self._db_mixed_audio_path:
+            videoEditor.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {'url': self._db_mixed_audio_path})
+            return
+        videoEditor.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {
+                                   'url': self._db_audio_path})
+        videoEditor.addEditingStep(EditingStep.ADD_BACKGROUND_MUSIC, {'url': self._db_background_music_url,
+                                                                      'loop_background_music': self._db_voiceover_duration,
+                                                                      "volume_percentage": music_volume})
+
+    def _getBackgroundVideoStep(self):
+        # Backgrounds extracted before cropping was done by ffmpeg still need the crop step
+        return EditingStep.ADD_BACKGROUND_SHORT if self._db_background_cropped else EditingStep.CROP_1920x1080
 
     def _prepareCustomAssets(self):
-        self.logger("Rendering short: (3/4) preparing custom assets...")
+        self.logger("Rendering short: (4/4) preparing custom assets...")
         pass
 
     def _editAndRenderShort(self):
@@ -150,31 +206,28 @@ class ContentShortEngine(AbstractContentEngine):
         if not (os.path.exists(outputPath)):
             self.logger("Rendering short: Starting automated editing...")
             videoEditor = EditingEngine()
-            videoEditor.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {
-                                       'url': self._db_audio_path})
-            videoEditor.addEditingStep(EditingStep.ADD_BACKGROUND_MUSIC, {'url': self._db_background_music_url,
-                                                                          'loop_background_music': self._db_voiceover_duration,
-                                                                          "volume_percentage": 0.11})
-            videoEditor.addEditingStep(EditingStep.CROP_1920x1080, {
+            self._addAudioSteps(videoEditor)
+            videoEditor.addEditingStep(self._getBackgroundVideoStep(), {
                                        'url': self._db_background_trimmed})
             videoEditor.addEditingStep(EditingStep.ADD_SUBSCRIBE_ANIMATION, {'url': AssetDatabase.get_asset_link('subscribe animation')})
 
             # Watermark step removed
 
             caption_type = EditingStep.ADD_CAPTION_SHORT_ARABIC if self._db_language == Language.ARABIC.value else EditingStep.ADD_CAPTION_SHORT
-            for timing, text in self._db_timed_captions:
-                videoEditor.addEditingStep(caption_type, {'text': text.upper(),
-                                                          'set_time_start': timing[0],
-                                                          'set_time_end': timing[1]})
+            videoEditor.addEditingSteps(caption_type, [{'text': text.upper(),
+                                                        'set_time_start': timing[0],
+                                                        'set_time_end': timing[1]}
+                                                       for timing, text in self._db_timed_captions])
             if self._db_num_images:
                 fallback_image = getattr(self, 'fallback_image', "public/white_reddit_template.png")
                 main_topic = getattr(self, 'facts_subject', None)
                 print(f"[DEBUG] Main topic for this short: {main_topic}")
                 count = 0
-                from shortGPT.editing_utils.editing_images import searchImageUrlsFromQuery
+                # Jobs resumed past the image search step download their images here
+                self._downloadImages()
                 # Force main topic image at start
                 if main_topic:
-                    main_topic_image = searchImageUrlsFromQuery(main_topic)
+                    main_topic_image = self._db_main_topic_image_path
                     if not main_topic_image:
                         print(f"[INFO] Fallback image used for main topic: {fallback_image}")
                         main_topic_image = fallback_image
@@ -183,16 +236,16 @@ class ContentShortEngine(AbstractContentEngine):
                         'set_time_start': 0,
                         'set_time_end': 2})
                     count += 1
-                for timing, image_url in self._db_timed_image_urls:
-                    print(f"[DEBUG] Query for segment at {timing[0]}s: {image_url}")
-                    if not image_url and main_topic:
-                        print(f"[INFO] No image found for segment at {timing[0]}s, trying main topic: {main_topic}")
-                        image_url = searchImageUrlsFromQuery(main_topic)
-                    if not image_url:
+                for timing, image_path in (self._db_timed_image_paths or []):
+                    print(f"[DEBUG] Image for segment at {timing[0]}s: {image_path}")
+                    if not image_path and self._db_main_topic_image_path:
+                        print(f"[INFO] No image found for segment at {timing[0]}s, using main topic image: {main_topic}")
+                        image_path = self._db_main_topic_image_path
+                    if not image_path:
                         print(f"[INFO] Fallback image used for topic at {timing[0]}s: {fallback_image}")
-                        image_url = fallback_image
+                        image_path = fallback_image
                     videoEditor.addEditingStep(EditingStep.SHOW_IMAGE, {
-                        'url': image_url,
+                        'url': image_path,
                         'set_time_start': timing[0],
                         'set_time_end': timing[1]})
                     count += 1
@@ -206,7 +259,8 @@ class ContentShortEngine(AbstractContentEngine):
             print("***** SCHEMA FOR RENDERING ****")
             print(videoEditor.dumpEditingSchema())
             print("***** SCHEMA FOR RENDERING ****")
-            videoEditor.renderVideo(outputPath, logger= self.logger if self.logger is not self.default_logger else None)
+            videoEditor.renderVideo(outputPath, logger= self.logger if self.logger is not self.default_logger else None,
+                                    backend=self.render_backend, segments=self.render_segments)
 
         self._db_video_path = outputPath
 
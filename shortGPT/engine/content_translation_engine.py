@@ -3,12 +3,11 @@ import os
 import re
 import shutil
 
-from tqdm import tqdm
-
 from shortGPT.audio.audio_duration import get_asset_duration
-from shortGPT.audio.audio_utils import (audioToText, get_asset_duration,
-                                        run_background_audio_split,
-                                        speedUpAudio)
+from shortGPT.audio.audio_utils import (audioToText,
+                                        generateTimedVoiceBlocks,
+                                        get_asset_duration,
+                                        run_background_audio_split)
 from shortGPT.audio.voice_module import VoiceModule
 from shortGPT.config.languages import ACRONYM_LANGUAGE_MAPPING, Language
 from shortGPT.editing_framework.editing_engine import (EditingEngine,
@@ -17,7 +16,7 @@ from shortGPT.editing_utils.captions import (getCaptionsWithTime,
                                              getSpeechBlocks)
 from shortGPT.editing_utils.handle_videos import get_aspect_ratio
 from shortGPT.engine.abstract_content_engine import AbstractContentEngine
-from shortGPT.gpt.gpt_translate import translateContent
+from shortGPT.gpt.gpt_translate import translateContents
 
 
 class ContentTranslationEngine(AbstractContentEngine):
@@ -43,7 +42,7 @@ class ContentTranslationEngine(AbstractContentEngine):
         video_audio, _ = get_asset_duration(self._db_src_url, isVideo=False)
         self.verifyParameters(content_path=video_audio)
         self.logger(f"1/5 - Transcribing original audio to text...")
-        whispered = audioToText(video_audio, model_size='base')
+        whispered = audioToText(video_audio, model_size='base', cache_id=self._db_src_url)
         self._db_speech_blocks = getSpeechBlocks(whispered, silence_time=0.8)
         if (ACRONYM_LANGUAGE_MAPPING.get(whispered['language']) == Language(self._db_target_language)):
             self._db_translated_timed_sentences = self._db_speech_blocks
@@ -59,26 +58,35 @@ class ContentTranslationEngine(AbstractContentEngine):
         if (self._db_should_translate):
             self.verifyParameters(_db_speech_blocks=self._db_speech_blocks)
 
-            translated_timed_sentences = []
-            for i, ((t1, t2), text) in tqdm(enumerate(self._db_speech_blocks), desc="Translating content"):
-                self.logger(f"2/5 - Translating text content - {i+1} / {len(self._db_speech_blocks)}")
-                translated_text = translateContent(text, self._db_target_language)
-                translated_timed_sentences.append([[t1, t2], translated_text])
-            self._db_translated_timed_sentences = translated_timed_sentences
+            # Blocks translated before an interruption are kept by index, and not sent again
+            translated_blocks = {int(i): text for i, text in (self._db_translated_blocks or {}).items()}
+
+            def checkpoint(index, translated_text):
+                translated_blocks[index] = translated_text
+                self._db_translated_blocks = {str(i): text for i, text in translated_blocks.items()}
+                self.flush()
+                self.logger(f"2/5 - Translating text content - {len(translated_blocks)} / {len(self._db_speech_blocks)}")
+
+            translations = translateContents([text for _, text in self._db_speech_blocks], self._db_target_language,
+                                             done=translated_blocks, on_result=checkpoint)
+            self._db_translated_timed_sentences = [[[t1, t2], translated_text]
+                                                   for ((t1, t2), _), translated_text in zip(self._db_speech_blocks, translations)]
 
     def _generate_translated_audio(self):
         self.verifyParameters(translated_timed_sentences=self._db_translated_timed_sentences)
 
-        translated_audio_blocks = []
-        for i, ((t1, t2), translated_text) in tqdm(enumerate(self._db_translated_timed_sentences), desc="Generating translated audio"):
-            self.logger(f"3/5 - Generating translated audio - {i+1} / {len(self._db_translated_timed_sentences)}")
-            translated_voice = self.voiceModule.generate_voice(translated_text, self.dynamicAssetDir+f"translated_{i}_{self._db_target_language}.wav")
-            if not translated_voice:
-                raise Exception('An error happending during audio voice creation')
-            final_audio_path = speedUpAudio(translated_voice, self.dynamicAssetDir+f"translated_{i}_{self._db_target_language}_spedup.wav", expected_duration=t2-t1 - 0.05)
-            _, translated_duration = get_asset_duration(final_audio_path, isVideo=False)
-            translated_audio_blocks.append([[t1, t1+translated_duration], final_audio_path])
-        self._db_audio_bits = translated_audio_blocks
+        # Blocks generated before an interruption are kept by index, and not synthesized again
+        audio_blocks = {int(i): block for i, block in (self._db_translated_audio_blocks or {}).items()}
+
+        def checkpoint(index, block):
+            audio_blocks[index] = block
+            self._db_translated_audio_blocks = {str(i): b for i, b in audio_blocks.items()}
+            self.flush()
+            self.logger(f"3/5 - Generating translated audio - {len(audio_blocks)} / {len(self._db_translated_timed_sentences)}")
+
+        self._db_audio_bits = generateTimedVoiceBlocks(self.voiceModule, self._db_translated_timed_sentences,
+                                                       self.dynamicAssetDir + "translated_{index}_" + self._db_target_language,
+                                                       done=audio_blocks, on_result=checkpoint)
 
     def _edit_and_render_video(self):
         self.verifyParameters(_db_audio_bits=self._db_audio_bits)
@@ -117,7 +125,8 @@ class ContentTranslationEngine(AbstractContentEngine):
     
         self._db_video_path = self.dynamicAssetDir+"translated_content.mp4"
 
-        editing_engine.renderVideo(self._db_video_path, logger= self.logger if self.logger is not self.default_logger else None)
+        editing_engine.renderVideo(self._db_video_path, logger= self.logger if self.logger is not self.default_logger else None,
+                                   backend=self.render_backend, segments=self.render_segments)
     def _add_metadata(self):
         self.logger(f"5 / 5 - Saving translated video")
         now = datetime.datetime.now()
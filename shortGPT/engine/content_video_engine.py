@@ -3,15 +3,17 @@ import os
 import re
 import shutil
 
-from shortGPT.api_utils.pexels_api import getBestVideo
-from shortGPT.audio import audio_utils
+from shortGPT.api_utils.pexels_api import getBestVideosTimed
+from shortGPT.audio import audio_pipeline, audio_utils
 from shortGPT.audio.audio_duration import get_asset_duration
 from shortGPT.audio.voice_module import VoiceModule
 from shortGPT.config.asset_db import AssetDatabase
 from shortGPT.config.languages import Language
+from shortGPT.editing_framework.core_editing_engine import RENDER_FPS
 from shortGPT.editing_framework.editing_engine import (EditingEngine,
                                                        EditingStep)
-from shortGPT.editing_utils import captions
+from shortGPT.editing_utils import captions, editing_images
+from shortGPT.editing_utils.handle_videos import prepare_stock_clips
 from shortGPT.engine.abstract_content_engine import AbstractContentEngine
 from shortGPT.gpt import gpt_editing, gpt_translate, gpt_yt
 
@@ -142,17 +144,8 @@ class ContentVideoEngine(AbstractContentEngine):
     def _generateVideoUrls(self):
         timed_video_searches = self._db_timed_video_searches
         self.verifyParameters(captionsTimed=timed_video_searches)
-        timed_video_urls = []
-        used_links = []
-        for (t1, t2), search_terms in timed_video_searches:
-            url = ""
-            for query in reversed(search_terms):
-                url = getBestVideo(query, orientation_landscape=not self._db_format_vertical, used_vids=used_links)
-                if url:
-                    used_links.append(url.split('.hd')[0])
-                    break
-            timed_video_urls.append([[t1, t2], url])
-        self._db_timed_video_urls = timed_video_urls
+        # Every query is searched concurrently, then the videos are picked segment by segment without reusing one
+        self._db_timed_video_urls = getBestVideosTimed(timed_video_searches, orientation_landscape=not self._db_format_vertical)
 
     def _chooseBackgroundMusic(self):
         if self._db_background_music_name:
@@ -164,10 +157,50 @@ class ContentVideoEngine(AbstractContentEngine):
             self.logger("Rendering short: (1/4) preparing voice asset...")
             self._db_audio_path, self._db_voiceover_duration = get_asset_duration(
                 self._db_audio_path, isVideo=False)
+        if self._db_background_music_url and not self._db_mixed_audio_path:
+            self.logger("Rendering short: (2/4) mixing background music...")
+            self._db_mixed_audio_path, _ = audio_pipeline.mix_voiceover_and_music(
+                self._db_audio_path, self._db_background_music_url, self.dynamicAssetDir + "mixed_audio.wav",
+                voiceover_duration=self._db_voiceover_duration, music_volume=0.08)
+        self._prepareStockClips()
+
+    def _prepareStockClips(self):
+        """Downloads the stock clips and transcodes them to the video size and fps, trimmed to their segment"""
+        if not self._db_timed_video_urls:
+            return
+        if self._db_timed_video_paths is not None:
+            # Clips deleted since they were prepared (cleaned asset folder, job resumed on another machine) are prepared again,
+            # segments that kept their url because their clip failed are streamed
+            if all(os.path.exists(path) or path == url for (_, path), (_, url) in
+                   zip(self._db_timed_video_paths, self._db_timed_video_urls) if path):
+                return
+        self.logger("Rendering short: (3/4) preparing stock video clips...")
+        size = (1080, 1920) if self._db_format_vertical else (1920, 1080)
+        self._db_timed_video_paths = prepare_stock_clips(
+            self._db_timed_video_urls, self.dynamicAssetDir + "stock_clips/", size, RENDER_FPS)
 
     def _prepareCustomAssets(self):
-        self.logger("Rendering short: (3/4) preparing custom assets...")
-        pass
+        self.logger("Rendering short: (4/4) preparing custom assets...")
+        self._prepareImageAssets()
+
+    def _prepareImageAssets(self):
+        """Searches the image queries concurrently and downloads the images, so rendering only reads local files"""
+        if self._db_image_assets is not None or not self._db_image_queries:
+            return
+        queries = []
+        for query_data in self._db_image_queries:
+            query = query_data["query"]
+            # Clean up query
+            if not query.startswith("http") and (query.isdigit() or len(query) < 3):
+                if self._db_main_topic:
+                    query = self._db_main_topic
+            queries.append(query)
+        image_urls = editing_images.searchImageUrlsFromQueries([query for query in queries if not query.startswith("http")])
+        # Direct image URLs are downloaded as they are
+        urls = [query if query.startswith("http") else image_urls[query] for query in queries]
+        image_paths = editing_images.downloadImages(urls, self.dynamicAssetDir + "images/")
+        self._db_image_assets = [{"timestamp": query_data["timestamp"], "query": query, "path": image_paths.get(url)}
+                                 for query_data, query, url in zip(self._db_image_queries, queries, urls)]
 
     def _editAndRenderShort(self):
         self.verifyParameters(
@@ -177,13 +210,20 @@ class ContentVideoEngine(AbstractContentEngine):
         if not (os.path.exists(outputPath)):
             self.logger("Rendering short: Starting automated editing...")
             videoEditor = EditingEngine()
-            videoEditor.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {
-                                       'url': self._db_audio_path})
-            if (self._db_background_music_url):
+            if self._db_mixed_audio_path:
+                # Voiceover and background music pre-mixed by ffmpeg
+                videoEditor.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {
+                                           'url': self._db_mixed_audio_path})
+            else:
+                videoEditor.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {
+                                           'url': self._db_audio_path})
+            if (self._db_background_music_url and not self._db_mixed_audio_path):
                 videoEditor.addEditingStep(EditingStep.ADD_BACKGROUND_MUSIC, {'url': self._db_background_music_url,
                                                                               'loop_background_music': self._db_voiceover_duration,
                                                                               "volume_percentage": 0.08})
-            for (t1, t2), video_url in self._db_timed_video_urls:
+            # Jobs resumed past the background assets step prepare their clips here
+            self._prepareStockClips()
+            for (t1, t2), video_url in (self._db_timed_video_paths or self._db_timed_video_urls):
                 videoEditor.addEditingStep(EditingStep.ADD_BACKGROUND_VIDEO, {'url': video_url,
                                                                               'set_time_start': t1,
                                                                               'set_time_end': t2})
@@ -192,46 +232,30 @@ class ContentVideoEngine(AbstractContentEngine):
             else:
                 caption_type = EditingStep.ADD_CAPTION_LANDSCAPE_ARABIC if self._db_language == Language.ARABIC.value else EditingStep.ADD_CAPTION_LANDSCAPE
 
-            for (t1, t2), text in self._db_timed_captions:
-                videoEditor.addEditingStep(caption_type, {'text': text.upper(),
-                                                          'set_time_start': t1,
-                                                          'set_time_end': t2})
+            videoEditor.addEditingSteps(caption_type, [{'text': text.upper(),
+                                                        'set_time_start': t1,
+                                                        'set_time_end': t2}
+                                                       for (t1, t2), text in self._db_timed_captions])
 
             # Add image overlays before captions so they appear behind text
-            if hasattr(self, '_db_image_queries') and self._db_image_queries:
-                for i, query_data in enumerate(self._db_image_queries):
-                    timestamp = query_data["timestamp"]
-                    query = query_data["query"]
-                    
-                    # Use direct image URL if that's what was provided
-                    if query.startswith("http"):
-                        self.logger(f"[DEBUG] Query for segment at {timestamp}s: {query}")
+            if self._db_image_queries:
+                # Jobs resumed past the custom assets step download their images here
+                self._prepareImageAssets()
+                for image_asset in self._db_image_assets:
+                    timestamp = image_asset["timestamp"]
+                    query = image_asset["query"]
+                    if not image_asset["path"] or not os.path.isfile(image_asset["path"]):
+                        self.logger(f"[WARNING] Could not find image for '{query}'")
+                        continue
+                    self.logger(f"[DEBUG] Adding image '{query}' at {timestamp}s")
+                    try:
                         videoEditor.addEditingStep(EditingStep.ADD_IMAGE, {
-                            'url': query,
+                            'url': image_asset["path"],
                             'set_time_start': timestamp,
                             'set_time_end': timestamp + 4.0
                         })
-                    else:
-                        # Clean up query
-                        if query.isdigit() or len(query) < 3:
-                            if hasattr(self, '_db_main_topic') and self._db_main_topic:
-                                query = self._db_main_topic
-                    
-                        self.logger(f"[DEBUG] Adding image '{query}' at {timestamp}s")
-                        try:
-                            from shortGPT.editing_utils.editing_images import searchImageUrlsFromQuery
-                            image_url = searchImageUrlsFromQuery(query)
-                            
-                            if image_url:
-                                videoEditor.addEditingStep(EditingStep.ADD_IMAGE, {
-                                    'url': image_url,
-                                    'set_time_start': timestamp,
-                                    'set_time_end': timestamp + 4.0
-                                })
-                            else:
-                                self.logger(f"[WARNING] Could not find image for '{query}'")
-                        except Exception as e:
-                            self.logger(f"[ERROR] Failed to add image for '{query}': {str(e)}")
+                    except Exception as e:
+                        self.logger(f"[ERROR] Failed to add image for '{query}': {str(e)}")
             else:
                 self.logger("WARNING: No image queries generated. Video will not have image overlays.")
             
@@ -240,7 +264,8 @@ class ContentVideoEngine(AbstractContentEngine):
                 self.logger("Video exceeds 30 seconds (current: {:.1f}s). Enforcing 30 second limit.".format(self._db_voiceover_duration))
                 videoEditor.addEditingStep(EditingStep.CLIP_VIDEO, {'duration': 30})
             
-            videoEditor.renderVideo(outputPath, logger= self.logger if self.logger is not self.default_logger else None)
+            videoEditor.renderVideo(outputPath, logger= self.logger if self.logger is not self.default_logger else None,
+                                    backend=self.render_backend, segments=self.render_segments)
 
         self._db_video_path = outputPath
 
@@ -45,7 +45,7 @@ class RedditShortEngine(ContentShortEngine):
         """
         Override parent method to generate custom reddit image asset
         """
-        self.logger("Rendering short: (3/4) preparing custom reddit image...")
+        self.logger("Rendering short: (4/4) preparing custom reddit image...")
         self.verifyParameters(question=self._db_reddit_question,)
         title, header, n_comments, n_upvotes = reddit_gpt.generateRedditPostMetadata(
             self._db_reddit_question)
@@ -73,12 +73,8 @@ class RedditShortEngine(ContentShortEngine):
         if not (os.path.exists(outputPath)):
             self.logger("Rendering short: Starting automated editing...")
             videoEditor = EditingEngine()
-            videoEditor.addEditingStep(EditingStep.ADD_VOICEOVER_AUDIO, {
-                                       'url': self._db_audio_path})
-            videoEditor.addEditingStep(EditingStep.ADD_BACKGROUND_MUSIC, {'url': self._db_background_music_url,
-                                                                          'loop_background_music': self._db_voiceover_duration,
-                                                                          "volume_percentage": 0.11})
-            videoEditor.addEditingStep(EditingStep.CROP_1920x1080, {
+            self._addAudioSteps(videoEditor)
+            videoEditor.addEditingStep(self._getBackgroundVideoStep(), {
                                        'url': self._db_background_trimmed})
             videoEditor.addEditingStep(EditingStep.ADD_SUBSCRIBE_ANIMATION, {'url': AssetDatabase.get_asset_link('subscribe animation')})
 
@@ -92,12 +88,16 @@ class RedditShortEngine(ContentShortEngine):
                                                                      'set_time_start': timing[0],
                                                                      'set_time_end': timing[1]})
             if self._db_num_images:
-                for timing, image_url in self._db_timed_image_urls:
-                    videoEditor.addEditingStep(EditingStep.SHOW_IMAGE, {'url': image_url,
+                self._downloadImages()
+                for timing, image_path in (self._db_timed_image_paths or []):
+                    if not image_path:
+                        continue
+                    videoEditor.addEditingStep(EditingStep.SHOW_IMAGE, {'url': image_path,
                                                                         'set_time_start': timing[0],
                                                                         'set_time_end': timing[1]})
 
-            videoEditor.renderVideo(outputPath, logger= self.logger if self.logger is not self.default_logger else None)
+            videoEditor.renderVideo(outputPath, logger= self.logger if self.logger is not self.default_logger else None,
+                                    backend=self.render_backend, segments=self.render_segments)
 
         self._db_video_path = outputPath
 
@@ -25,9 +25,15 @@ def getImageQueryPairs(captions, n=15, maxTime=2):
         main_subject = extract_main_subject(all_text)
         
         # Get response and parse JSON
-        res = gpt_utils.llm_completion(chat_prompt=prompt)
+        # Cached, the same captions get the same queries when a step is re-run
+        res = gpt_utils.llm_completion(chat_prompt=prompt, cache=True)
         print(f"[DEBUG] Raw image query response: {res}")
-        data = extractJsonFromString(res)
+        try:
+            data = extractJsonFromString(res)
+        except Exception:
+            # A malformed answer mustn't stay in the cache, ask again and replace it
+            res = gpt_utils.llm_completion(chat_prompt=prompt, cache=True, refresh=True)
+            data = extractJsonFromString(res)
         
         # Validate and fix queries if needed
         validated_queries = []
@@ -90,7 +96,7 @@ def getVideoSearchQueriesTimed(captions_timed):
     """
     err = ""
 
-    for _ in range(4):
+    for attempt in range(4):
         try:
             # Get total video duration from last caption
             end_time = captions_timed[-1][0][1]
@@ -100,7 +106,8 @@ def getVideoSearchQueriesTimed(captions_timed):
             prompt = chat.replace("<<TIMED_CAPTIONS>>", f"{captions_timed}")
             
             # Get response and parse JSON
-            res = gpt_utils.llm_completion(chat_prompt=prompt, system=system)
+            # Cached, retries replace the cached answer that couldn't be used
+            res = gpt_utils.llm_completion(chat_prompt=prompt, system=system, cache=True, refresh=attempt > 0)
             data = extractJsonFromString(res)
             
             # Convert to expected format
@@ -1,10 +1,78 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from shortGPT.gpt import gpt_utils
 
+TRANSLATION_WORKERS = int(os.getenv('TRANSLATION_WORKERS', 4))
+# Texts packed in a single translation request, 1 sends each text on its own
+TRANSLATION_BLOCKS_PER_REQUEST = int(os.getenv('TRANSLATION_BLOCKS_PER_REQUEST', 1))
+
+
+def _get_language_instruction(language):
+    if language == "arabic":
+        language = "arabic, and make the translated text two third of the length of the original."
+    return language
+
+
 def translateContent(content, language):
     chat, system = gpt_utils.load_local_yaml_prompt('prompt_templates/translate_content.yaml')
-    if language == "arabic":
-        language =="arabic, and make the translated text two third of the length of the original."
+    language = _get_language_instruction(language)
     system = system.replace("<<LANGUAGE>>", language)
     chat = chat.replace("<<CONTENT>>", content)
-    result = gpt_utils.llm_completion(chat_prompt=chat, system=system, temp=1)
-    return result
\ No newline at end of file
+    result = gpt_utils.llm_completion(chat_prompt=chat, system=system, temp=1, cache=True)
+    return result
+
+
+def translateContentBatch(contents, language):
+    """Translates several texts in one request, falling back to one request per text if the answer can't be split back"""
+    if len(contents) == 1:
+        return [translateContent(contents[0], language)]
+    chat, system = gpt_utils.load_local_yaml_prompt('prompt_templates/translate_content_batch.yaml')
+    system = system.replace("<<LANGUAGE>>", _get_language_instruction(language))
+    blocks = {str(i + 1): content for i, content in enumerate(contents)}
+    chat = chat.replace("<<CONTENT>>", json.dumps(blocks, ensure_ascii=False))
+    result = gpt_utils.llm_completion(chat_prompt=chat, system=system, temp=1, remove_nl=False, cache=True)
+    try:
+        translated = json.loads(result[result.index('{'):result.rindex('}') + 1])
+        if set(translated) == set(blocks):
+            return [str(translated[block_id]).strip() for block_id in blocks]
+    except ValueError:
+        pass
+    print(f"Batched translation answer couldn't be split into {len(contents)} blocks, translating them one by one")
+    return [translateContent(content, language) for content in contents]
+
+
+def translateContents(contents, language, max_workers=TRANSLATION_WORKERS, blocks_per_request=TRANSLATION_BLOCKS_PER_REQUEST, done=None, on_result=None):
+    """Translates a list of texts with concurrent requests, keeping their order.
+    Args:
+        contents (list): The texts to translate.
+        language (str): The target language.
+        max_workers (int): Number of requests sent simultaneously.
+        blocks_per_request (int): Number of texts packed in one request.
+        done (dict): Translations already made, by index. These texts aren't sent again.
+        on_result (callable): Called in the calling thread with (index, translation) as soon as a text is translated, to checkpoint progress.
+    Returns:
+        list: The translations, in the order of contents.
+    """
+    results = dict(done or {})
+    pending = [i for i in range(len(contents)) if i not in results]
+    blocks_per_request = max(blocks_per_request, 1)
+    batches = [pending[i:i + blocks_per_request] for i in range(0, len(pending), blocks_per_request)]
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(translateContentBatch, [contents[i] for i in batch], language): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                translations = future.result()
+            except Exception as e:
+                # Keep collecting the other results, so they are checkpointed before failing
+                errors.append(e)
+                continue
+            for index, translation in zip(futures[future], translations):
+                results[index] = translation
+                if on_result:
+                    on_result(index, translation)
+    if errors:
+        raise Exception(f"Failed translating {len(contents) - len(results)} of {len(contents)} texts: {errors[0]}")
+    return [results[i] for i in range(len(contents))]
@@ -1,13 +1,16 @@
 import json
 import os
 import re
-from time import sleep, time
+import threading
+from time import sleep
 
+import httpx
 import openai
 import tiktoken
 import yaml
 
 from shortGPT.config.api_db import ApiKeyManager
+from shortGPT.gpt.llm_cache import LLM_RESPONSE_CACHE
 
 
 def num_tokens_from_messages(texts, model="gpt-4o-mini"):
@@ -69,20 +72,84 @@ def open_file(filepath):
         return infile.read()
 from openai import OpenAI
 
-def llm_completion(chat_prompt="", system="", temp=0.7, max_tokens=2000, remove_nl=True, conversation=None):
-    openai_key= ApiKeyManager.get_api_key("OPENAI_API_KEY")
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+# Maximum number of simultaneous requests per provider, the rest wait for a free slot
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 4))
+
+
+class LLMClientRegistry:
+    """
+    Shared OpenAI-compatible clients, one per (provider, api key, base url).
+    Each client keeps its HTTP connections alive between requests, so sequential calls of an engine
+    reuse the same TLS connection. Requests to a provider are limited to its concurrency limit.
+    """
+    _clients = {}
+    _semaphores = {}
+    _concurrency_limits = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls, provider: str, api_key: str, base_url: str = None) -> OpenAI:
+        key = (provider, api_key, base_url)
+        with cls._lock:
+            if key not in cls._clients:
+                # A new key for this provider replaces the clients of its previous key
+                for stale_key in [k for k in cls._clients if k[0] == provider]:
+                    cls._clients.pop(stale_key).close()
+                limit = cls._get_concurrency_limit(provider)
+                http_client = httpx.Client(limits=httpx.Limits(max_connections=limit, max_keepalive_connections=limit))
+                cls._clients[key] = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            return cls._clients[key]
+
+    @classmethod
+    def get_semaphore(cls, provider: str) -> threading.BoundedSemaphore:
+        with cls._lock:
+            if provider not in cls._semaphores:
+                cls._semaphores[provider] = threading.BoundedSemaphore(cls._get_concurrency_limit(provider))
+            return cls._semaphores[provider]
+
+    @classmethod
+    def set_concurrency_limit(cls, provider: str, limit: int):
+        """Sets the concurrency limit of a provider, for clients and requests created afterwards"""
+        with cls._lock:
+            cls._concurrency_limits[provider] = limit
+            cls._semaphores.pop(provider, None)
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            for client in cls._clients.values():
+                client.close()
+            cls._clients.clear()
+            cls._semaphores.clear()
+
+    @classmethod
+    def _get_concurrency_limit(cls, provider: str) -> int:
+        return cls._concurrency_limits.get(provider, LLM_MAX_CONCURRENCY)
+
+
+def get_llm_endpoint():
+    """Returns the (provider, client, model) used for LLM requests, Gemini first when both keys are set"""
+    openai_key = ApiKeyManager.get_api_key("OPENAI_API_KEY")
     gemini_key = ApiKeyManager.get_api_key("GEMINI_API_KEY")
     if gemini_key:
-        client = OpenAI( 
-            api_key=gemini_key,
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-        )
-        model="gemini-2.0-flash-lite-preview-02-05"
+        return "gemini", LLMClientRegistry.get_client("gemini", gemini_key, GEMINI_BASE_URL), "gemini-2.0-flash-lite-preview-02-05"
     elif openai_key:
-        client = OpenAI( api_key=openai_key)
-        model="gpt-4o-mini"
-    else:
-        raise Exception("No OpenAI or Gemini API Key found for LLM request")
+        return "openai", LLMClientRegistry.get_client("openai", openai_key), "gpt-4o-mini"
+    raise Exception("No OpenAI or Gemini API Key found for LLM request")
+
+
+def llm_completion(chat_prompt="", system="", temp=0.7, max_tokens=2000, remove_nl=True, conversation=None, cache=None, refresh=False):
+    provider, client, model = get_llm_endpoint()
+    # cache=None caches deterministic calls when LLM_RESPONSE_CACHE is enabled, True/False force it on or off
+    # refresh=True asks the API again and replaces the cached response, for answers the caller couldn't use
+    cache_key = None
+    if LLM_RESPONSE_CACHE.should_cache(temp, cache):
+        cache_key = LLM_RESPONSE_CACHE.get_key(model, system, chat_prompt, conversation, temp, max_tokens, remove_nl)
+        text = LLM_RESPONSE_CACHE.get(cache_key) if not refresh else None
+        if text is not None:
+            LLM_RESPONSE_CACHE.log_call(model, system, chat_prompt, conversation, text, cached=True)
+            return text
     max_retry = 5
     retry = 0
     error = ""
@@ -95,21 +162,20 @@ def llm_completion(chat_prompt="", system="", temp=0.7, max_tokens=2000, remove_
                     {"role": "system", "content": system},
                     {"role": "user", "content": chat_prompt}
                 ]
-            response = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temp,
-                timeout=30
-                )
+            with LLMClientRegistry.get_semaphore(provider):
+                response = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temp,
+                    timeout=30
+                    )
             text = response.choices[0].message.content.strip()
             if remove_nl:
                 text = re.sub('\s+', ' ', text)
-            filename = '%s_llm_completion.txt' % time()
-            if not os.path.exists('.logs/gpt_logs'):
-                os.makedirs('.logs/gpt_logs')
-            with open('.logs/gpt_logs/%s' % filename, 'w', encoding='utf-8') as outfile:
-                outfile.write(f"System prompt: ===\n{system}\n===\n"+f"Chat prompt: ===\n{chat_prompt}\n===\n" + f'RESPONSE:\n====\n{text}\n===\n')
+            if cache_key:
+                LLM_RESPONSE_CACHE.put(cache_key, model, text)
+            LLM_RESPONSE_CACHE.log_call(model, system, chat_prompt, conversation, text)
             return text
         except Exception as oops:
             retry += 1
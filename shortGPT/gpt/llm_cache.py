@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+LLM_STORE_PATH = ".logs/llm_calls.sqlite3"
+# The response cache is opt-in, enable it with LLM_RESPONSE_CACHE=1 or llm_completion(cache=True)
+LLM_RESPONSE_CACHE_ENABLED = os.getenv('LLM_RESPONSE_CACHE', '').lower() in ('1', 'true', 'yes')
+# Calls above this temperature are creative and not cached, unless the cache is forced
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv('LLM_CACHE_MAX_TEMPERATURE', 0.5))
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', 5000))
+LLM_LOG_MAX_ENTRIES = int(os.getenv('LLM_LOG_MAX_ENTRIES', 20000))
+
+
+class LLMResponseCache:
+    '''
+    Sqlite store of LLM calls: a log of every completion, and a cache of responses keyed on a fingerprint
+    of the request (model, prompts or conversation, temperature, max tokens).
+    Cached responses expire after LLM_CACHE_TTL seconds, and the least recently used are evicted past
+    LLM_CACHE_MAX_ENTRIES. The log keeps the last LLM_LOG_MAX_ENTRIES calls.
+    '''
+
+    def __init__(self, path=LLM_STORE_PATH, enabled=LLM_RESPONSE_CACHE_ENABLED, max_temperature=LLM_CACHE_MAX_TEMPERATURE,
+                 ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_MAX_ENTRIES, max_log_entries=LLM_LOG_MAX_ENTRIES):
+        self.path = path
+        self.enabled = enabled
+        self.max_temperature = max_temperature
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_log_entries = max_log_entries
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def get_key(self, model, system, chat_prompt, conversation, temp, max_tokens, remove_nl) -> str:
+        request = {'model': model, 'system': system, 'chat_prompt': chat_prompt, 'conversation': conversation,
+                   'temp': temp, 'max_tokens': max_tokens, 'remove_nl': remove_nl}
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    def should_cache(self, temp, force=None) -> bool:
+        '''force=True caches any call, force=False none, None follows the settings and the temperature limit'''
+        if force is not None:
+            cached = force
+        else:
+            cached = self.enabled and temp <= self.max_temperature
+        if not cached:
+            with self._lock:
+                self.bypassed += 1
+        return cached
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            connection = self._connection()
+            row = connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None and time.time() - row[1] <= self.ttl:
+                connection.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            else:
+                row = None
+        except sqlite3.Error as e:
+            print(f"Failed reading the LLM response cache: {e}")
+            row = None
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return row[0]
+
+    def put(self, key: str, model, response: str):
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute("INSERT OR REPLACE INTO responses (key, model, response, created, last_used, hits) VALUES (?, ?, ?, ?, ?, 0)",
+                               (key, model, response, now, now))
+            self._evict(connection)
+        except sqlite3.Error as e:
+            print(f"Failed caching LLM response: {e}")
+
+    def log_call(self, model, system, chat_prompt, conversation, response, cached=False):
+        '''Records a completion, in place of the former one file per call in .logs/gpt_logs'''
+        prompt = chat_prompt if not conversation else json.dumps(conversation, ensure_ascii=False)
+        try:
+            connection = self._connection()
+            cursor = connection.execute("INSERT INTO calls (ts, model, system, prompt, response, cached) VALUES (?, ?, ?, ?, ?, ?)",
+                                        (time.time(), model, system, prompt, response, int(cached)))
+            if cursor.lastrowid % 100 == 0:
+                connection.execute("DELETE FROM calls WHERE id <= ?", (cursor.lastrowid - self.max_log_entries,))
+        except sqlite3.Error as e:
+            print(f"Failed logging LLM call: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'bypassed': self.bypassed,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def clear(self):
+        self._connection().execute("DELETE FROM responses")
+
+    def _evict(self, connection):
+        connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        connection.execute("""DELETE FROM responses WHERE key IN (
+                                SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)""", (self.max_entries,))
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with self._lock:
+                if not self._initialized:
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.execute("""CREATE TABLE IF NOT EXISTS responses (
+                        key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL,
+                        created REAL NOT NULL, last_used REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)""")
+                    connection.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)")
+                    connection.execute("""CREATE TABLE IF NOT EXISTS calls (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT, ts REAL NOT NULL, model TEXT,
+                        system TEXT, prompt TEXT, response TEXT, cached INTEGER NOT NULL DEFAULT 0)""")
+                    connection.execute("CREATE INDEX IF NOT EXISTS idx_calls_ts ON calls (ts)")
+                    self._initialized = True
+            self._local.connection = connection
+        return connection
+
+
+LLM_RESPONSE_CACHE = LLMResponseCache()
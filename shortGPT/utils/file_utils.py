@@ -0,0 +1,12 @@
+import os
+import shutil
+
+
+def link_or_copy(src, dst):
+    '''Places src at dst as a hard link, or as a copy when the two paths are on different filesystems'''
+    if os.path.exists(dst):
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)